@@ -0,0 +1,199 @@
+# src/audio_mix.py
+"""
+In-process voice + music mix (NumPy, float32, 44.1 kHz).
+
+voice: body + CTA concatenated in memory, band-limited (80 Hz – 12 kHz)
+music: ducked under the voice by an envelope follower
+mix:   look-ahead peak limiter, handed to ffmpeg as one PCM stream
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.utils.audio_buffer import AudioBuffer
+from src.utils.audio_utils import decode_pcm, SAMPLE_RATE
+
+# ---------------- VOICE ---------------- #
+VOICE_HIGHPASS_HZ = 80
+VOICE_LOWPASS_HZ = 12000
+VOICE_CEILING = 0.97
+
+# ---------------- DUCKING ---------------- #
+FRAME_SEC = 0.010
+# Voice frames above this RMS count as speech
+VOICE_GATE_DB = -40.0
+# Music comes up by this much where nobody speaks
+DUCK_RANGE_DB = 6.0
+ATTACK_SEC = 0.05
+RELEASE_SEC = 0.40
+
+# ---------------- LIMITER ---------------- #
+LIMIT_CEILING = 10 ** (-1.0 / 20)  # -1 dBFS
+LIMIT_LOOKAHEAD_SEC = 0.005
+LIMIT_RELEASE_SEC = 0.08
+
+# Legacy fixed music level when the library has no loudness for it
+DEFAULT_MUSIC_GAIN_DB = 20 * np.log10(0.20)
+
+
+# -------------------------------------------------
+# HELPERS
+# -------------------------------------------------
+
+def _band_limit(x: np.ndarray, low: float, high: float) -> np.ndarray:
+    """
+    Zero-phase band-pass via FFT with short cosine tapers at the edges.
+    """
+    spectrum = np.fft.rfft(x, axis=0)
+    freqs = np.fft.rfftfreq(len(x), 1 / SAMPLE_RATE)
+
+    gain = np.ones_like(freqs, dtype=np.float32)
+    gain[freqs < low / 2] = 0.0
+    ramp = (freqs >= low / 2) & (freqs < low)
+    gain[ramp] = 0.5 - 0.5 * np.cos(np.pi * (freqs[ramp] - low / 2) / (low / 2))
+    gain[freqs > high * 1.2] = 0.0
+    ramp = (freqs > high) & (freqs <= high * 1.2)
+    gain[ramp] = 0.5 + 0.5 * np.cos(np.pi * (freqs[ramp] - high) / (high * 0.2))
+
+    return np.fft.irfft(spectrum * gain[:, None], n=len(x), axis=0).astype(np.float32)
+
+
+def _frame_reduce(x: np.ndarray, frame: int, fn) -> np.ndarray:
+    """
+    fn (np.max / rms…) over consecutive frames of x (any channels).
+    """
+    mono = np.abs(x).max(axis=1) if x.ndim == 2 else np.abs(x)
+    pad = (-len(mono)) % frame
+    mono = np.pad(mono, (0, pad))
+    return fn(mono.reshape(-1, frame))
+
+
+def _rms(frames: np.ndarray) -> np.ndarray:
+    return np.sqrt(np.mean(frames ** 2, axis=1))
+
+
+def _smooth(curve: np.ndarray, attack: int, release: int, mode: str) -> np.ndarray:
+    """
+    Envelope smoothing without a per-sample loop: a sliding hold
+    (max for "up" curves, min for "down") covers the release, then a
+    moving average gives the attack ramp.
+    """
+    hold = max(1, release)
+    padded = np.pad(curve, (hold - 1, 0), mode="edge")
+    windows = sliding_window_view(padded, hold)
+    held = windows.max(axis=1) if mode == "up" else windows.min(axis=1)
+
+    ramp = max(1, attack)
+    kernel = np.ones(ramp, dtype=np.float32) / ramp
+    return np.convolve(np.pad(held, (ramp - 1, 0), mode="edge"), kernel, mode="valid")
+
+
+def _to_samples(frame_curve: np.ndarray, frame: int, n: int) -> np.ndarray:
+    centers = (np.arange(len(frame_curve)) + 0.5) * frame
+    return np.interp(np.arange(n), centers, frame_curve).astype(np.float32)
+
+
+# -------------------------------------------------
+# STAGES
+# -------------------------------------------------
+
+def _prepare_voice(voice: np.ndarray) -> np.ndarray:
+    v = _band_limit(voice[:, None], VOICE_HIGHPASS_HZ, VOICE_LOWPASS_HZ)[:, 0]
+    peak = float(np.abs(v).max()) if len(v) else 0.0
+    if peak > VOICE_CEILING:
+        v *= np.float32(VOICE_CEILING / peak)
+    return v
+
+
+def _prepare_music(music: "str | AudioBuffer", frames: int, is_stem: bool) -> np.ndarray:
+    if isinstance(music, AudioBuffer):
+        m = music.samples[:frames]
+    else:
+        m = decode_pcm(music, max_seconds=frames / SAMPLE_RATE + 1)
+    if len(m) == 0:
+        return np.zeros((frames, 2), dtype=np.float32)
+
+    # Raw tracks may be shorter than the short; stems never are
+    if len(m) < frames and not is_stem:
+        m = np.tile(m, (frames // len(m) + 1, 1))
+
+    if len(m) < frames:
+        m = np.pad(m, ((0, frames - len(m)), (0, 0)))
+    return m[:frames]
+
+
+def duck_gain(voice: np.ndarray, base_gain_db: float, rms: np.ndarray | None = None) -> np.ndarray:
+    """
+    Per-sample music gain: base_gain_db under speech, DUCK_RANGE_DB
+    higher in the gaps, with attack/release smoothing. rms (per
+    FRAME_SEC frame) is reused when the voice buffer already has it.
+    """
+    frame = int(FRAME_SEC * SAMPLE_RATE)
+    if rms is None:
+        rms = _frame_reduce(voice, frame, _rms)
+    else:
+        n = -(-len(voice) // frame)
+        rms = np.pad(rms[:n], (0, max(0, n - len(rms))))
+    speaking = (20 * np.log10(rms + 1e-9) > VOICE_GATE_DB).astype(np.float32)
+
+    activity = _smooth(
+        speaking,
+        attack=int(ATTACK_SEC / FRAME_SEC),
+        release=int(RELEASE_SEC / FRAME_SEC),
+        mode="up",
+    )
+    gain_db = base_gain_db + DUCK_RANGE_DB * (1.0 - activity)
+    return _to_samples(10 ** (gain_db / 20), frame, len(voice))
+
+
+def limit(mix: np.ndarray) -> np.ndarray:
+    """
+    Look-ahead peak limiter to LIMIT_CEILING (then a hard safety clip).
+    """
+    frame = max(1, int(LIMIT_LOOKAHEAD_SEC * SAMPLE_RATE))
+    peaks = _frame_reduce(mix, frame, lambda f: f.max(axis=1))
+    wanted = np.minimum(1.0, LIMIT_CEILING / np.maximum(peaks, 1e-9))
+
+    # Look-ahead: each frame also obeys the next one
+    wanted = np.minimum(wanted, np.append(wanted[1:], 1.0))
+    gain = _smooth(
+        wanted,
+        attack=1,
+        release=int(LIMIT_RELEASE_SEC / LIMIT_LOOKAHEAD_SEC),
+        mode="down",
+    )
+    gain = np.minimum(gain, wanted)
+
+    out = mix * _to_samples(gain, frame, len(mix))[:, None]
+    return np.clip(out, -LIMIT_CEILING, LIMIT_CEILING)
+
+
+# -------------------------------------------------
+# PUBLIC API
+# -------------------------------------------------
+
+def mix_audio(
+    voice: AudioBuffer | np.ndarray,
+    music_file: "str | AudioBuffer",
+    duration: float,
+    music_gain_db: float | None = None,
+    music_is_stem: bool = False
+) -> np.ndarray:
+    """
+    Finished stereo mix (frames, 2) float32 at SAMPLE_RATE, `duration`
+    seconds long, ready to pipe to the encoder. music_file may be an
+    already decoded stereo AudioBuffer (variants share one).
+    """
+    rms = None
+    if isinstance(voice, AudioBuffer):
+        rms = voice.frame_rms(FRAME_SEC)
+        voice = voice.mono()
+
+    frames = int(duration * SAMPLE_RATE)
+    v = _prepare_voice(voice)[:frames]
+    v = np.pad(v, (0, frames - len(v)))
+
+    base = DEFAULT_MUSIC_GAIN_DB if music_gain_db is None else music_gain_db
+    music = _prepare_music(music_file, frames, music_is_stem)
+    music = music * duck_gain(v, base, rms)[:, None]
+
+    return limit(music + v[:, None])
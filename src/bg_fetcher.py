@@ -1,12 +1,23 @@
 # src/bg_fetcher.py
 
-import requests
 import random
 import os
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
 
 from src.visual_intent import build_visual_queries
 from src.utils.video_history import get_recent_video_ids, mark_video_used
+from src.utils import http_client, cache_manager
+from src.utils.search_cache import cached_search
+from src.utils.downloads import download_atomic, single_flight, metered, DownloadIncomplete
+from src.utils.mp4_range import download_segment, read_window, window_path, RangeNotSupported
+from src.utils.logger import logger
+from src.video_utils import probe_video
+from src import clip_index
 
 load_dotenv()
 
@@ -27,24 +38,146 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 # Prevent duplicates in a single run (cross-provider)
 USED_VIDEO_IDS: set[str] = set()
 
+# Concurrency (all query x provider searches run at once)
+MAX_SEARCH_WORKERS = 8
+MAX_DOWNLOAD_WORKERS = 4
+
+# Whole-stage guard if providers stall
+FETCH_DEADLINE_SEC = 60
+
+# Output frame (render scales to cover, then crops)
+TARGET_WIDTH = 1080
+TARGET_HEIGHT = 1920
+PORTRAIT_RATIO = TARGET_WIDTH / TARGET_HEIGHT
+
+# Extra seconds fetched around a partial window (trim start jitter)
+SEGMENT_MARGIN_SEC = 1.0
+
+# Smaller cached files are junk (truncated legacy downloads)
+MIN_VIDEO_BYTES = 100_000
+
 # --------------------------------------------------
 # DOWNLOAD
 # --------------------------------------------------
 
-def _download_video(url: str, uid: str) -> str:
+def _valid_video(path: str) -> bool:
+    info = probe_video(path)
+    return info["width"] > 0 and info["duration"] > 0
+
+
+# Full cached files already probed this process: (path, mtime, size) -> ok
+_probed: dict[tuple, bool] = {}
+
+
+def _is_full(path: str) -> bool:
+    """
+    A complete, playable cached file (no partial-window sidecar).
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if read_window(path) is not None:
+        return False
+
+    # A full download, or a legacy truncated file — probe once
+    key = (path, st.st_mtime_ns, st.st_size)
+    if key not in _probed:
+        try:
+            _probed[key] = st.st_size >= MIN_VIDEO_BYTES and _valid_video(path)
+        except Exception:
+            _probed[key] = False
+    return _probed[key]
+
+
+def _cached_covers(path: str, segment: float) -> bool:
+    window = read_window(path) if os.path.exists(path) else None
+    if window is not None:
+        return window[1] - window[0] >= segment
+    return _is_full(path)
+
+
+def _download_video(url: str, uid: str, segment: float = 0.0) -> str:
+    """
+    segment > 0: only that many seconds are needed, so try an HTTP
+    Range partial fetch first (falls back to the full file).
+    """
     path = os.path.join(OUTPUT_DIR, f"{uid}.mp4")
 
-    if os.path.exists(path):
+    if _cached_covers(path, segment):
+        cache_manager.touch(path)
         return path
 
-    with requests.get(url, stream=True, timeout=30) as r:
-        r.raise_for_status()
-        with open(path, "wb") as f:
-            for chunk in r.iter_content(1024 * 1024):
-                if chunk:
-                    f.write(chunk)
+    # Single flight: a concurrent job fetching the same clip is waited for
+    with single_flight(path):
+        if _cached_covers(path, segment):
+            cache_manager.touch(path)
+            return path
 
-    return path
+        if segment > 0:
+            try:
+                start, end = download_segment(
+                    url, path, segment + SEGMENT_MARGIN_SEC, validate=_valid_video
+                )
+                logger.debug(f"✂️ Partial fetch {uid}: {start:.1f}s → {end:.1f}s")
+                cache_manager.register(path)
+                return path
+            except RangeNotSupported as e:
+                logger.debug(f"Partial fetch skipped for {uid}: {e}")
+            except DownloadIncomplete:
+                raise
+            except Exception as e:
+                logger.debug(f"Partial fetch failed for {uid}: {e}")
+
+        # A too-short partial window (or an invalid legacy file) is swapped
+        # for the full file by rename — never deleted under another job
+        download_atomic(url, path, validate=_valid_video, replace=lambda p: not _is_full(p))
+        if os.path.exists(window_path(path)):
+            os.remove(window_path(path))
+        cache_manager.register(path)
+        return path
+
+
+# --------------------------------------------------
+# RENDITION CHOICE
+# --------------------------------------------------
+
+def _covers_target(w: int, h: int) -> bool:
+    """
+    True if scale-to-cover + crop to 1080x1920 needs no upscaling.
+    """
+    return w >= TARGET_WIDTH * 0.98 and h >= TARGET_HEIGHT * 0.98
+
+
+def _is_native_portrait(w: int, h: int) -> bool:
+    return h > 0 and abs(w / h - PORTRAIT_RATIO) < 0.02
+
+
+def _pick_rendition(files: list[dict]) -> dict | None:
+    """
+    Smallest rendition that still covers the 1080x1920 output,
+    native 9:16 preferred. If none covers, the largest available.
+
+    files: dicts with width, height and optional size (bytes).
+    """
+    files = [f for f in files if f.get("width") and f.get("height")]
+    if not files:
+        return None
+
+    def cost(f):
+        return f.get("size") or f["width"] * f["height"]
+
+    covering = [f for f in files if _covers_target(f["width"], f["height"])]
+    if covering:
+        return min(
+            covering,
+            key=lambda f: (not _is_native_portrait(f["width"], f["height"]), cost(f))
+        )
+
+    return max(
+        files,
+        key=lambda f: (f["height"] >= f["width"], f["width"] * f["height"])
+    )
 
 
 # --------------------------------------------------
@@ -60,16 +193,36 @@ def _search_pexels(query: str) -> list[dict]:
         "size": "small",
     }
 
-    res = requests.get(url, headers=PEXELS_HEADERS, params=params, timeout=15)
-    res.raise_for_status()
-    return res.json().get("videos", [])
+    def fetch():
+        res = http_client.get(url, headers=PEXELS_HEADERS, params=params)
+        return res.json().get("videos", [])
+
+    return cached_search("pexels", query, params, fetch)
+
+
+def _pexels_tags(v: dict) -> list[str]:
+    # Page URL slug is the only reliable description: /video/<words>-<id>/
+    slug = v.get("url", "").rstrip("/").rsplit("/", 1)[-1]
+    words = " ".join(p for p in slug.split("-") if not p.isdigit())
+    return [words] + list(v.get("tags") or []) if words else list(v.get("tags") or [])
 
 
-def _fetch_from_pexels(query: str) -> str | None:
+def _pexels_meta(v: dict) -> dict:
+    return {
+        "page_url": v.get("url"),
+        "user": (v.get("user") or {}).get("name"),
+        "duration": v.get("duration"),
+        "width": v.get("width"),
+        "height": v.get("height"),
+    }
+
+
+def _pexels_candidates(query: str, min_duration: float = 0.0) -> list[dict]:
     recent = get_recent_video_ids("pexels")
     videos = _search_pexels(query)
     random.shuffle(videos)
 
+    candidates = []
     for v in videos:
         vid = f"pexels_{v['id']}"
 
@@ -77,19 +230,28 @@ def _fetch_from_pexels(query: str) -> str | None:
         if vid in USED_VIDEO_IDS or vid in recent:
             continue
 
-        files = v.get("video_files", [])
-        if not files:
+        # Too short to cover its segment
+        if (v.get("duration") or 0) < min_duration:
             continue
 
-        # Highest vertical resolution
-        best = max(files, key=lambda f: f["height"])
+        files = [
+            f for f in v.get("video_files", [])
+            if f.get("file_type", "video/mp4") == "video/mp4"
+        ]
+        best = _pick_rendition(files)
+        if not best:
+            continue
 
-        path = _download_video(best["link"], vid)
-        USED_VIDEO_IDS.add(vid)
-        mark_video_used("pexels", vid)
-        return path
+        candidates.append({
+            "uid": vid,
+            "provider": "pexels",
+            "url": best["link"],
+            "query": query,
+            "tags": _pexels_tags(v),
+            "meta": _pexels_meta(v),
+        })
 
-    return None
+    return candidates
 
 
 # --------------------------------------------------
@@ -99,98 +261,362 @@ def _fetch_from_pexels(query: str) -> str | None:
 def _search_pixabay(query: str) -> list[dict]:
     url = "https://pixabay.com/api/videos/"
     params = {
-        "key": PIXABAY_API_KEY,
         "q": query,
         "orientation": "vertical",
         "per_page": 20,
         "safesearch": "true",
     }
 
-    res = requests.get(url, params=params, timeout=15)
-    res.raise_for_status()
-    return res.json().get("hits", [])
+    def fetch():
+        res = http_client.get(url, params={"key": PIXABAY_API_KEY, **params})
+        return res.json().get("hits", [])
+
+    # API key stays out of the cache key
+    return cached_search("pixabay", query, params, fetch)
 
 
-def _fetch_from_pixabay(query: str) -> str | None:
+def _pixabay_tags(v: dict) -> list[str]:
+    return [t.strip() for t in v.get("tags", "").split(",") if t.strip()]
+
+
+def _pixabay_meta(v: dict) -> dict:
+    return {
+        "page_url": v.get("pageURL"),
+        "user": v.get("user"),
+        "duration": v.get("duration"),
+    }
+
+
+def _pixabay_candidates(query: str, min_duration: float = 0.0) -> list[dict]:
     recent = get_recent_video_ids("pixabay")
     videos = _search_pixabay(query)
     random.shuffle(videos)
 
+    candidates = []
     for v in videos:
         vid = f"pixabay_{v['id']}"
 
         if vid in USED_VIDEO_IDS or vid in recent:
             continue
 
-        files = v.get("videos", {})
-        if not files:
+        if (v.get("duration") or 0) < min_duration:
             continue
 
         # Only vertical videos
-        candidates = [
-            f for f in files.values()
-            if f["height"] >= f["width"]
+        vertical = [
+            f for f in v.get("videos", {}).values()
+            if f.get("url") and f.get("height", 0) >= f.get("width", 0)
         ]
-
-        if not candidates:
+        best = _pick_rendition(vertical)
+        if not best:
             continue
 
-        best = max(candidates, key=lambda f: f["height"])
-
-        path = _download_video(best["url"], vid)
-        USED_VIDEO_IDS.add(vid)
-        mark_video_used("pixabay", vid)
-        return path
+        candidates.append({
+            "uid": vid,
+            "provider": "pixabay",
+            "url": best["url"],
+            "query": query,
+            "tags": _pixabay_tags(v),
+            "meta": _pixabay_meta(v),
+        })
 
-    return None
+    return candidates
 
 
 # --------------------------------------------------
 # MULTI-CLIP FETCHER (PIPELINE)
 # --------------------------------------------------
 
-def fetch_background_clips(idea: str, n: int) -> list[str]:
+def _search_jobs(queries: list[str]) -> list[tuple]:
+    jobs = []
+    for query in queries:
+        jobs.append((_pexels_candidates, query))
+        # Provider tuning
+        jobs.append((_pixabay_candidates, f"{query} abstract cinematic"))
+    return jobs
+
+
+def _download_candidate(c: dict, segment: float = 0.0) -> str:
+    path = _download_video(c["url"], c["uid"], segment)
+
+    try:
+        clip_index.add_clip(
+            c["uid"], c["provider"], path,
+            queries=[c["query"]],
+            tags=c.get("tags"),
+            meta=c.get("meta"),
+        )
+    except Exception as e:
+        logger.warning(f"📚 Clip index update failed: {e}")
+
+    return path
+
+
+def _download_until(c: dict, segment: float, stop: threading.Event) -> str:
+    """
+    _download_candidate that gives up between chunks once stop is set
+    (the .part is kept for the next job to resume).
+    """
+    def check(_nbytes: int):
+        if stop.is_set():
+            raise DownloadIncomplete("background fetch finished")
+
+    with metered(check):
+        return _download_candidate(c, segment)
+
+
+def _local_clips(queries: list[str], n: int, min_duration: float = 0.0) -> list[str]:
+    """
+    Matching clips already in assets/bg_cache, outside the reuse window,
+    that cover min_duration and are playable.
+    """
+    recent = get_recent_video_ids("pexels") | get_recent_video_ids("pixabay")
+
+    try:
+        hits = clip_index.find_clips(
+            queries, n,
+            exclude=recent | USED_VIDEO_IDS,
+            min_duration=min_duration
+        )
+    except Exception as e:
+        logger.warning(f"📚 Clip index lookup failed: {e}")
+        return []
+
+    clips = []
+    for hit in hits:
+        # Same check as a cache hit in _download_video: a covering window,
+        # or a full file that probes valid (not a truncated leftover)
+        if not _cached_covers(hit["path"], min_duration):
+            logger.debug(f"📚 Skipping unusable local clip {hit['uid']}")
+            continue
+
+        USED_VIDEO_IDS.add(hit["uid"])
+        mark_video_used(hit["provider"], hit["uid"])
+        cache_manager.touch(hit["path"])
+        clips.append(hit["path"])
+
+    if clips:
+        logger.info(f"📚 {len(clips)}/{n} background clips served from local index")
+
+    return clips
+
+
+def fetch_background_clips(idea: str, n: int, min_duration: float = 0.0) -> list[str]:
     """
     Fetch MULTIPLE DISTINCT background clips
     from BOTH Pexels + Pixabay with history protection.
+
+    The local clip index is tried first; providers are only
+    searched for what it cannot supply.
+
+    All query x provider searches are issued concurrently.
+    Candidates are ranked as responses arrive (best pick of each
+    response first, spares only once searches are exhausted), the
+    top n download in parallel, and everything still outstanding is
+    cancelled as soon as n clips are secured.
+
+    min_duration: segment length each clip must cover (seconds).
     """
 
     queries = build_visual_queries(idea)
     random.shuffle(queries)
 
-    providers = [_fetch_from_pexels, _fetch_from_pixabay]
-    clips: list[str] = []
+    clips: list[str] = _local_clips(queries, n, min_duration)
+    if len(clips) >= n:
+        cache_manager.lease(*clips)
+        return clips
 
-    for query in queries:
-        if len(clips) >= n:
-            break
+    search_pool = ThreadPoolExecutor(MAX_SEARCH_WORKERS, thread_name_prefix="bg-search")
+    download_pool = ThreadPoolExecutor(MAX_DOWNLOAD_WORKERS, thread_name_prefix="bg-download")
+
+    searches = {
+        search_pool.submit(fetcher, query, min_duration): query
+        for fetcher, query in _search_jobs(queries)
+    }
+    downloads: dict = {}
 
-        random.shuffle(providers)
+    ranked: list = []          # (rank within response, arrival, candidate)
+    arrival = itertools.count()
 
-        for fetcher in providers:
-            if len(clips) >= n:
-                break
+    deadline = time.monotonic() + FETCH_DEADLINE_SEC
+    stop = threading.Event()
 
-            try:
-                provider_query = query
+    def launch():
+        while ranked and len(clips) + len(downloads) < n:
+            rank = ranked[0][0]
+
+            # Spares wait until every search has answered (diversity)
+            if rank > 0 and searches:
+                return
+
+            _, _, c = heapq.heappop(ranked)
+            if c["uid"] in USED_VIDEO_IDS:
+                continue
+
+            USED_VIDEO_IDS.add(c["uid"])
+            downloads[download_pool.submit(_download_until, c, min_duration, stop)] = c
 
-                # Provider tuning
-                if fetcher == _fetch_from_pixabay:
-                    provider_query = f"{query} abstract cinematic"
+    try:
+        while len(clips) < n and (searches or downloads or ranked):
+            if not searches and not downloads:
+                launch()
+                if not downloads:
+                    break
 
-                video = fetcher(provider_query)
-                if video:
-                    clips.append(video)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f"⏱️ Background fetch deadline hit with {len(clips)}/{n} clips")
+                break
 
-            except Exception:
+            done, _ = wait(
+                set(searches) | set(downloads),
+                timeout=remaining,
+                return_when=FIRST_COMPLETED
+            )
+            if not done:
                 continue
 
+            for fut in done:
+                if fut in searches:
+                    searches.pop(fut)
+                    try:
+                        candidates = fut.result()
+                    except Exception:
+                        continue
+
+                    for rank, c in enumerate(candidates):
+                        heapq.heappush(ranked, (rank, next(arrival), c))
+
+                else:
+                    c = downloads.pop(fut)
+                    try:
+                        path = fut.result()
+                    except Exception:
+                        USED_VIDEO_IDS.discard(c["uid"])
+                        continue
+
+                    if len(clips) < n:
+                        clips.append(path)
+                        mark_video_used(c["provider"], c["uid"])
+
+            launch()
+
+    finally:
+        # Early exit: drop queued work, stop in-flight downloads
+        stop.set()
+        search_pool.shutdown(wait=False, cancel_futures=True)
+        download_pool.shutdown(wait=False, cancel_futures=True)
+        for c in downloads.values():
+            USED_VIDEO_IDS.discard(c["uid"])
+
     if not clips:
         raise RuntimeError("No background clips found")
 
+    # In use until this job finishes rendering
+    cache_manager.lease(*clips)
     return clips
 
 
+# --------------------------------------------------
+# PREFETCH (queued jobs)
+# --------------------------------------------------
+
+def _safe_search(job: tuple) -> list[dict]:
+    fetcher, query, min_duration = job
+    try:
+        return fetcher(query, min_duration)
+    except Exception as e:
+        logger.debug(f"Prefetch search failed ({query}): {e}")
+        return []
+
+
+def prefetch_background_clips(idea: str, n: int, min_duration: float = 0.0):
+    """
+    Warms the search cache for idea's visual queries, then yields
+    (path, bytes_on_disk) as up to n new candidate clips land in the
+    cache and clip index. Nothing is marked used — the job's own
+    fetch_background_clips picks them up from the local index.
+    Stop iterating to stop downloading.
+    """
+    queries = build_visual_queries(idea)
+    jobs = [(fetcher, query, min_duration) for fetcher, query in _search_jobs(queries)]
+
+    with ThreadPoolExecutor(MAX_SEARCH_WORKERS, thread_name_prefix="bg-prefetch") as pool:
+        responses = list(pool.map(_safe_search, jobs))
+
+    # Best pick of every response first (same order as the live fetch)
+    ranked = sorted(
+        (rank, i, c)
+        for i, candidates in enumerate(responses)
+        for rank, c in enumerate(candidates)
+    )
+
+    seen = set()
+    fetched = 0
+    for _, _, c in ranked:
+        if fetched >= n:
+            return
+        if c["uid"] in seen or c["uid"] in USED_VIDEO_IDS:
+            continue
+        seen.add(c["uid"])
+
+        if _cached_covers(os.path.join(OUTPUT_DIR, f"{c['uid']}.mp4"), min_duration):
+            continue
+
+        try:
+            path = _download_candidate(c, min_duration)
+        except DownloadIncomplete:
+            raise
+        except Exception as e:
+            logger.debug(f"Prefetch download failed ({c['uid']}): {e}")
+            continue
+
+        # Seed one hit: an unconsumed prefetch must not be the LFU's first victim
+        cache_manager.touch(path)
+        fetched += 1
+        yield path, cache_manager.disk_size(path)
+
+
+# --------------------------------------------------
+# INDEX BACKFILL
+# --------------------------------------------------
+
+def _lookup_metadata(provider: str, raw_id: str) -> tuple[list[str], dict]:
+    if provider == "pexels":
+        v = http_client.get(
+            f"https://api.pexels.com/videos/videos/{raw_id}",
+            headers=PEXELS_HEADERS,
+        ).json()
+        return _pexels_tags(v), _pexels_meta(v)
+
+    hits = http_client.get(
+        "https://pixabay.com/api/videos/",
+        params={"key": PIXABAY_API_KEY, "id": raw_id},
+    ).json().get("hits", [])
+    if not hits:
+        return [], {}
+    return _pixabay_tags(hits[0]), _pixabay_meta(hits[0])
+
+
+def backfill_index() -> int:
+    """
+    Indexes clips downloaded before the index existed,
+    recovering tags from the provider APIs.
+    """
+    added = 0
+    for uid, provider, path in clip_index.unindexed_files(OUTPUT_DIR):
+        try:
+            tags, meta = _lookup_metadata(provider, uid.split("_", 1)[1])
+        except Exception as e:
+            logger.warning(f"📚 Metadata lookup failed for {uid}: {e}")
+            tags, meta = [], {}
+
+        clip_index.add_clip(uid, provider, path, queries=[], tags=tags, meta=meta)
+        added += 1
+
+    return added
+
+
 # --------------------------------------------------
 # LEGACY SINGLE FETCH (OPTIONAL)
 # --------------------------------------------------
@@ -1,9 +1,16 @@
 import os
 import random
-import requests
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
 from src.utils.logger import logger
+from src.utils import http_client, cache_manager
+from src.utils.audio_utils import get_audio_duration
+from src.utils.downloads import download_atomic, DownloadIncomplete
+from src.utils.search_cache import cached_search
+from src import music_library
+from src.utils.video_history import get_recent_video_ids, mark_video_used
 
 load_dotenv()
 
@@ -16,13 +23,15 @@ CACHE_DIR = "assets/music_cache"
 MIN_BYTES = 120_000                 # reject junk
 MAX_BYTES = 4 * 1024 * 1024          # 4 MB cap (enough for Shorts)
 MAX_DOWNLOAD_SECONDS = 12            # hard wall-clock cap
-CHUNK_SIZE = 128 * 1024              # 128 KB
 
 os.makedirs(CACHE_DIR, exist_ok=True)
 
-HEADERS = {
-    "User-Agent": "ai-shorts-bot/1.0"
-}
+# Tighter than the shared defaults — music must never stall a render
+SEARCH_TIMEOUT_SEC = 8
+DOWNLOAD_TIMEOUT_SEC = 6
+
+# Whole online music stage (searches + download); then the local library
+MUSIC_DEADLINE_SEC = float(os.getenv("MUSIC_DEADLINE_SEC", "15"))
 
 # ---------------- MOOD LOGIC ---------------- #
 
@@ -69,66 +78,97 @@ def detect_mood(text: str) -> str:
     return "neutral"
 
 
-def _download(url: str, uid: str, tag: str) -> str:
+def _valid_music(path: str) -> bool:
+    return get_audio_duration(path) > 0
+
+
+def _track_path(uid: str, tag: str) -> str:
+    return os.path.join(CACHE_DIR, f"{uid}_{_safe_name(tag)}.mp3")
+
+
+def _is_cached(item: dict, tag: str) -> bool:
+    path = _track_path(item.get("id") or "", tag)
+    return os.path.exists(path) and os.path.getsize(path) >= MIN_BYTES
+
+
+def _index(path: str, uid: str, tag: str, mood: str | None):
+    try:
+        music_library.add_track(path, uid, mood, tag)
+    except Exception as e:
+        logger.warning(f"🎼 Music library update failed: {e}")
+
+
+def _download(
+    url: str,
+    uid: str,
+    tag: str,
+    mood: str | None = None,
+    should_stop=None
+) -> str:
     """
     BOUNDED download:
-    - Time limited
-    - Size limited
-    - Partial download allowed
+    - Time limited (unfinished .part resumes next time)
+    - Size limited (truncated MP3 kept only if it still decodes)
+    - Atomic: the cache never holds a half-written track
     """
-    fname = f"{uid}_{_safe_name(tag)}.mp3"
-    path = os.path.join(CACHE_DIR, fname)
+    path = _track_path(uid, tag)
 
     if os.path.exists(path) and os.path.getsize(path) >= MIN_BYTES:
+        cache_manager.touch(path)
+        _index(path, uid, tag, mood)
         return path
 
     logger.info(f"⬇️ Downloading music (bounded): {url}")
 
-    start = time.time()
-    total = 0
-
     try:
-        with requests.get(
-            url,
-            headers=HEADERS,
-            stream=True,
-            timeout=6
-        ) as r:
-            r.raise_for_status()
-
-            with open(path, "wb") as f:
-                for chunk in r.iter_content(CHUNK_SIZE):
-                    if not chunk:
-                        break
-
-                    f.write(chunk)
-                    total += len(chunk)
-
-                    # 🚨 Size cap
-                    if total >= MAX_BYTES:
-                        logger.warning("🎵 Music too large — stopping early")
-                        break
-
-                    # 🚨 Time cap
-                    if time.time() - start >= MAX_DOWNLOAD_SECONDS:
-                        logger.warning("🎵 Music download timeout — stopping")
-                        break
-
+        path = download_atomic(
+            url, path,
+            validate=_valid_music,
+            min_bytes=MIN_BYTES,
+            max_bytes=MAX_BYTES,
+            max_seconds=MAX_DOWNLOAD_SECONDS,
+            should_stop=should_stop,
+            timeout=DOWNLOAD_TIMEOUT_SEC,
+            retries=1,
+        )
+    except DownloadIncomplete as e:
+        logger.warning(f"🎵 Music download stopped ({e}) — will resume later")
+        raise
     except Exception as e:
         logger.warning(f"🎵 Music download failed: {e}")
-        if os.path.exists(path):
-            os.remove(path)
         raise
 
-    # Validate
-    if not os.path.exists(path) or os.path.getsize(path) < MIN_BYTES:
-        if os.path.exists(path):
-            os.remove(path)
-        raise RuntimeError("Downloaded music invalid or too small")
-
+    cache_manager.register(path)
+    _index(path, uid, tag, mood)
     return path
 
 
+def _search_openverse(params: dict) -> list[dict]:
+    def fetch():
+        r = http_client.get(
+            SEARCH_URL,
+            params=params,
+            timeout=SEARCH_TIMEOUT_SEC,
+            retries=1,
+        )
+        return r.json().get("results", [])
+
+    # The query-less random fallback must differ per call, not per day
+    if not params.get("q"):
+        return fetch()
+
+    return cached_search("openverse", params["q"], params, fetch)
+
+
+def _mood_params(keyword: str) -> dict:
+    return {
+        "q": keyword,
+        "page_size": 20,
+        "license_type": "commercial",
+        "duration": "60",
+    }
+
+
 def _random_cached() -> str | None:
     files = [
         os.path.join(CACHE_DIR, f)
@@ -138,6 +178,72 @@ def _random_cached() -> str | None:
     return random.choice(files) if files else None
 
 
+_backfill_started = threading.Event()
+
+
+def _ensure_library():
+    """
+    Existing installs have tracks on disk but an empty library: index
+    them once per process, in the background (loudness + stems are slow).
+    """
+    if _backfill_started.is_set():
+        return
+    _backfill_started.set()
+
+    try:
+        if music_library.stats()["tracks"]:
+            return
+    except Exception as e:
+        logger.warning(f"🎼 Music library unavailable: {e}")
+        return
+
+    def run():
+        try:
+            added = backfill_library()
+            logger.info(f"🎼 Indexed {added} cached tracks into the music library")
+        except Exception as e:
+            logger.warning(f"🎼 Music library backfill failed: {e}")
+
+    threading.Thread(target=run, name="music-backfill", daemon=True).start()
+
+
+RANDOM_PARAMS = {
+    "page_size": 40,
+    "license_type": "commercial",
+}
+
+
+def _first_valid_track(
+    params: dict,
+    tag: str,
+    mood: str | None,
+    recent: set[str],
+    should_stop
+) -> tuple[str, str] | None:
+    """
+    Searches, then downloads results in random order until one
+    validates. Returns (path, uid) or None.
+    """
+    results = _search_openverse(params)
+    random.shuffle(results)
+
+    for item in results:
+        if should_stop():
+            return None
+
+        url = item.get("url")
+        uid = item.get("id")
+        if not url or not uid or uid in recent:
+            continue
+
+        try:
+            return _download(url, uid, tag, mood, should_stop=should_stop), uid
+        except Exception:
+            continue
+
+    return None
+
+
 # --------------------------------------------------
 # MAIN FETCHER
 # --------------------------------------------------
@@ -145,7 +251,7 @@ def _random_cached() -> str | None:
 def fetch_background_music(text: str) -> str:
     """
     Mood-aware Openverse music fetcher.
-    FAST, BOUNDED, NO HANGS.
+    FAST, BOUNDED, NO HANGS (MUSIC_DEADLINE_SEC for the whole stage).
     Silence is IMPOSSIBLE.
     """
 
@@ -155,77 +261,160 @@ def fetch_background_music(text: str) -> str:
 
     logger.info(f"🎼 Music mood detected: {mood}")
 
-    # 1️⃣ Mood-based search
-    for kw in keywords:
-        try:
-            r = requests.get(
-                SEARCH_URL,
-                headers=HEADERS,
-                params={
-                    "q": kw,
-                    "page_size": 20,
-                    "license_type": "commercial",
-                    "duration": "60",
-                },
-                timeout=8,
-            )
-            r.raise_for_status()
-
-            results = r.json().get("results", [])
-            random.shuffle(results)
-
-            for item in results:
-                url = item.get("url")
-                uid = item.get("id")
-
-                if not url or not uid:
-                    continue
+    _ensure_library()
+
+    # 0️⃣ Local library (incl. prefetched) — no network,
+    #    but never the same track twice within the reuse window
+    recent = get_recent_video_ids("openverse")
+    track = music_library.pick(keywords, exclude=recent)
+    if track:
+        mark_video_used("openverse", track["uid"])
+        cache_manager.touch(track["path"])
+        logger.info(f"🎵 Music selected from library (mood='{mood}', keyword='{track['keyword']}')")
+        return track["path"]
+
+    # 1️⃣ Mood keywords raced in parallel, 2️⃣ random search if all fail —
+    #    first validated track wins, everything bounded by one deadline
+    deadline = time.monotonic() + MUSIC_DEADLINE_SEC
+    stop = threading.Event()
+
+    def should_stop() -> bool:
+        return stop.is_set() or time.monotonic() >= deadline
+
+    pool = ThreadPoolExecutor(len(keywords) + 1, thread_name_prefix="music")
+    races = {
+        pool.submit(_first_valid_track, _mood_params(kw), kw, mood, recent, should_stop): kw
+        for kw in keywords
+    }
+    random_started = False
 
+    try:
+        while races:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f"🎵 Music deadline ({MUSIC_DEADLINE_SEC:.0f}s) reached")
+                break
+
+            done, _ = wait(races, timeout=remaining, return_when=FIRST_COMPLETED)
+
+            for fut in done:
+                kw = races.pop(fut)
                 try:
-                    path = _download(url, uid, kw)
-                    logger.info(
-                        f"🎵 Music selected (mood='{mood}', keyword='{kw}')"
-                    )
+                    hit = fut.result()
+                except Exception as e:
+                    logger.warning(f"🎵 Openverse search failed: {e}")
+                    hit = None
+
+                if hit:
+                    path, uid = hit
+                    mark_video_used("openverse", uid)
+                    if kw == "random":
+                        logger.warning("🎵 Openverse random fallback used")
+                    else:
+                        logger.info(f"🎵 Music selected (mood='{mood}', keyword='{kw}')")
                     return path
-                except Exception:
-                    continue
 
+            if not races and not random_started:
+                random_started = True
+                races[pool.submit(
+                    _first_valid_track, RANDOM_PARAMS, "random", None, recent, should_stop
+                )] = "random"
+
+    finally:
+        # Losers stop at their next chunk; their .part resumes another time
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    # 3️⃣ Library fallback — any mood, reuse allowed
+    track = music_library.pick(keywords) or music_library.pick()
+    if track:
+        logger.warning("🎵 Using cached music fallback")
+        cache_manager.touch(track["path"])
+        return track["path"]
+
+    # 4️⃣ Raw cache directory (library not indexed yet / unavailable)
+    cached = _random_cached()
+    if cached:
+        logger.warning("🎵 Using unindexed cached music fallback")
+        cache_manager.touch(cached)
+        return cached
+
+    # ❌ Silence NOT allowed
+    raise RuntimeError("❌ No usable Openverse background music found")
+
+
+# --------------------------------------------------
+# PREFETCH (queued jobs)
+# --------------------------------------------------
+
+def prefetch_music(text: str) -> str | None:
+    """
+    Warms the Openverse search cache for every mood keyword of text and
+    downloads one track, so the job's own fetch finds it on disk.
+    Returns the cached path, or None.
+    """
+    mood = detect_mood(text)
+
+    searches = {}
+    for kw in MOOD_MUSIC.get(mood, MOOD_MUSIC["neutral"]):
+        try:
+            searches[kw] = _search_openverse(_mood_params(kw))
         except Exception as e:
-            logger.warning(f"🎵 Openverse search failed: {e}")
-            continue
+            logger.debug(f"Music prefetch search failed ({kw}): {e}")
 
-    # 2️⃣ Random Openverse fallback
-    try:
-        r = requests.get(
-            SEARCH_URL,
-            headers=HEADERS,
-            params={
-                "page_size": 40,
-                "license_type": "commercial",
-            },
-            timeout=8,
-        )
-        r.raise_for_status()
+    recent = get_recent_video_ids("openverse")
 
-        results = r.json().get("results", [])
-        random.shuffle(results)
+    for kw, results in searches.items():
+        for item in results:
+            if item.get("id") not in recent and _is_cached(item, kw):
+                return _track_path(item["id"], kw)
 
+    for kw, results in searches.items():
         for item in results:
             url = item.get("url")
             uid = item.get("id")
+            if not url or not uid or uid in recent:
+                continue
+            try:
+                return _download(url, uid, kw, mood)
+            except DownloadIncomplete:
+                raise
+            except Exception:
+                continue
 
-            if url and uid:
-                logger.warning("🎵 Openverse random fallback used")
-                return _download(url, uid, "random")
+    return None
 
-    except Exception:
-        pass
 
-    # 3️⃣ Cache fallback (absolute last resort)
-    cached = _random_cached()
-    if cached:
-        logger.warning("🎵 Using cached music fallback")
-        return cached
+# --------------------------------------------------
+# LIBRARY BACKFILL (existing cache, not indexed yet)
+# --------------------------------------------------
 
-    # ❌ Silence NOT allowed
-    raise RuntimeError("❌ No usable Openverse background music found")
+def backfill_library() -> int:
+    """
+    Drops library rows of deleted files and indexes cached tracks
+    named <openverse id>_<keyword>.mp3. Returns tracks added.
+    """
+    keywords = {}
+    for mood, kws in MOOD_MUSIC.items():
+        for kw in kws:
+            keywords.setdefault(_safe_name(kw), (kw, mood))
+
+    music_library.prune_missing()
+
+    added = 0
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(".mp3"):
+            continue
+
+        path = os.path.join(CACHE_DIR, name)
+        uid, _, tag = name[:-4].rpartition("_")
+        if not uid or os.path.getsize(path) < MIN_BYTES:
+            continue
+
+        kw, mood = keywords.get(tag, (tag, None))
+        try:
+            added += music_library.add_track(path, uid, mood, kw)
+        except Exception as e:
+            logger.warning(f"🎼 Could not index {name}: {e}")
+
+    return added
@@ -1,11 +1,19 @@
 # src/captions_whisper.py
 import whisper
+import torch
 import re
 import os
+import threading
+
+from src.utils.audio_buffer import AudioBuffer
+from src.utils.resource_governor import cpu_slots
 
 # Load once (important!)
 _MODEL = whisper.load_model("base")
 
+# One transcription at a time (the model is shared across threads)
+_MODEL_LOCK = threading.Lock()
+
 
 def seconds_to_srt_time(seconds):
     h = int(seconds // 3600)
@@ -20,25 +28,26 @@ def clean_word(word: str) -> str:
     return word.strip()
 
 
-def generate_word_level_srt(audio_path: str, output_srt: str):
+def transcribe_words(audio) -> list[tuple[float, float, str]]:
     """
-    Generates word-accurate captions using Whisper
+    Word timings (start, end, word) from Whisper.
+    audio: file path, AudioBuffer, or 16 kHz mono float32 array.
     """
-    result = _MODEL.transcribe(
-        audio_path,
-        word_timestamps=True,
-        verbose=False
-    )
-
-    index = 1
-    srt_lines = []
-
+    # Decoded buffers skip Whisper's own ffmpeg pass
+    if isinstance(audio, AudioBuffer):
+        audio = audio.mono_16k()
+
+    with _MODEL_LOCK, cpu_slots("whisper") as threads:
+        torch.set_num_threads(threads)
+        result = _MODEL.transcribe(
+            audio,
+            word_timestamps=True,
+            verbose=False
+        )
+
+    words = []
     for segment in result.get("segments", []):
-        words = segment.get("words")
-        if not words:
-            continue
-
-        for w in words:
+        for w in segment.get("words") or []:
             word = clean_word(w.get("word", ""))
             if not word:
                 continue
@@ -50,16 +59,27 @@ def generate_word_level_srt(audio_path: str, output_srt: str):
             if start_sec is None or end_sec is None or end_sec <= start_sec:
                 continue
 
-            start = seconds_to_srt_time(start_sec)
-            end = seconds_to_srt_time(end_sec)
+            words.append((start_sec, end_sec, word))
+
+    return words
 
-            srt_lines.append(
-                f"{index}\n{start} --> {end}\n{word}\n"
-            )
-            index += 1
 
-    if not srt_lines:
+def write_srt(words: list[tuple[float, float, str]], output_srt: str):
+    if not words:
         raise RuntimeError("Whisper produced no valid word captions")
 
+    srt_lines = [
+        f"{i}\n{seconds_to_srt_time(start)} --> {seconds_to_srt_time(end)}\n{word}\n"
+        for i, (start, end, word) in enumerate(words, 1)
+    ]
+
     with open(output_srt, "w", encoding="utf-8") as f:
         f.write("\n".join(srt_lines))
+
+
+def generate_word_level_srt(audio, output_srt: str):
+    """
+    Generates word-accurate captions using Whisper.
+    audio: file path, AudioBuffer, or 16 kHz mono float32 array.
+    """
+    write_srt(transcribe_words(audio), output_srt)
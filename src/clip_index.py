@@ -0,0 +1,273 @@
+# src/clip_index.py
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+import numpy as np
+
+from src.utils.db import connect
+from src.utils.mp4_range import read_window
+from src.utils.logger import logger
+from src.video_utils import probe_video
+from src.visual_intent import STOPWORDS, ACTIONS, TIMES, CAMERA_STYLES, MOODS
+
+# -------------------------------------------------
+# CONFIG
+# -------------------------------------------------
+
+INDEX_PATH = "assets/bg_cache/index.db"
+
+# Hashed bag-of-words embedding size
+EMBED_DIM = 256
+
+# Minimum cosine similarity for a local clip to count as a match
+MIN_SIMILARITY = 0.35
+
+CLIP_NAME_RE = re.compile(r"^(pexels|pixabay)_(\d+)\.mp4$")
+
+# Style words every generated query carries — they say nothing about content
+STYLE_WORDS = {
+    w
+    for phrase in ACTIONS + TIMES + CAMERA_STYLES + MOODS + ["abstract", "cinematic"]
+    for w in phrase.split()
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clips (
+    uid TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    path TEXT NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    duration REAL,
+    meta TEXT,
+    added_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS clip_terms (
+    uid TEXT NOT NULL,
+    term TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    PRIMARY KEY (uid, term, kind)
+);
+CREATE INDEX IF NOT EXISTS idx_clip_terms_term ON clip_terms(term);
+CREATE TABLE IF NOT EXISTS clip_vectors (
+    uid TEXT PRIMARY KEY,
+    vec BLOB NOT NULL
+);
+"""
+
+_matrix_lock = threading.Lock()
+_matrix = {"version": None, "uids": [], "vectors": None}
+
+
+def _db():
+    conn = connect(INDEX_PATH)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+# -------------------------------------------------
+# EMBEDDING
+# -------------------------------------------------
+
+def _tokens(text: str) -> list[str]:
+    words = re.findall(r"[a-z]{3,}", text.lower())
+    return [w for w in words if w not in STOPWORDS and w not in STYLE_WORDS]
+
+
+def embed(texts: list[str]) -> np.ndarray:
+    """
+    Hashed bag-of-words (+ bigrams), L2-normalized float32 vector.
+    """
+    vec = np.zeros(EMBED_DIM, dtype=np.float32)
+
+    for text in texts:
+        toks = _tokens(text)
+        grams = toks + [f"{a} {b}" for a, b in zip(toks, toks[1:])]
+        for g in grams:
+            h = int.from_bytes(hashlib.md5(g.encode("utf-8")).digest()[:4], "little")
+            vec[h % EMBED_DIM] += 1.0 if " " not in g else 0.5
+
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else vec
+
+
+def _load_matrix(conn) -> tuple[list[str], np.ndarray | None]:
+    version = conn.execute("SELECT COUNT(*), MAX(rowid) FROM clip_vectors").fetchone()
+    version = tuple(version)
+
+    with _matrix_lock:
+        if _matrix["version"] != version:
+            rows = conn.execute("SELECT uid, vec FROM clip_vectors").fetchall()
+            _matrix["uids"] = [r["uid"] for r in rows]
+            _matrix["vectors"] = (
+                np.vstack([np.frombuffer(r["vec"], dtype=np.float32) for r in rows])
+                if rows else None
+            )
+            _matrix["version"] = version
+
+        return _matrix["uids"], _matrix["vectors"]
+
+
+# -------------------------------------------------
+# WRITE
+# -------------------------------------------------
+
+def add_clip(
+    uid: str,
+    provider: str,
+    path: str,
+    queries: list[str],
+    tags: list[str] | None = None,
+    meta: dict | None = None
+):
+    """
+    Indexes (or enriches) a cached clip. Probes resolution/duration once
+    (partial clips are re-probed, their window may have changed).
+    """
+    conn = _db()
+
+    row = conn.execute("SELECT width FROM clips WHERE uid = ?", (uid,)).fetchone()
+    if row is None or read_window(path):
+        try:
+            info = probe_video(path)
+        except Exception:
+            info = {"width": None, "height": None, "duration": None}
+
+        # Partial clips: only the fetched window is usable
+        window = read_window(path)
+        if window:
+            info["duration"] = window[1] - window[0]
+
+        conn.execute(
+            "INSERT OR REPLACE INTO clips (uid, provider, path, width, height, duration, meta, added_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                uid, provider, path,
+                info["width"], info["height"], info["duration"],
+                json.dumps(meta or {}), time.time(),
+            ),
+        )
+
+    terms = [(uid, q, "query") for q in queries if q] + [(uid, t, "tag") for t in (tags or []) if t]
+    conn.executemany(
+        "INSERT OR IGNORE INTO clip_terms (uid, term, kind) VALUES (?, ?, ?)",
+        terms,
+    )
+
+    all_terms = [r["term"] for r in conn.execute(
+        "SELECT term FROM clip_terms WHERE uid = ?", (uid,)
+    )]
+    conn.execute(
+        "INSERT OR REPLACE INTO clip_vectors (uid, vec) VALUES (?, ?)",
+        (uid, embed(all_terms).tobytes()),
+    )
+    conn.commit()
+
+
+def remove_clip(uid: str):
+    conn = _db()
+    for table in ("clips", "clip_terms", "clip_vectors"):
+        conn.execute(f"DELETE FROM {table} WHERE uid = ?", (uid,))
+    conn.commit()
+
+
+# -------------------------------------------------
+# SEARCH
+# -------------------------------------------------
+
+def find_clips(
+    queries: list[str],
+    n: int,
+    exclude: set[str] | None = None,
+    min_similarity: float = MIN_SIMILARITY,
+    min_duration: float = 0.0
+) -> list[dict]:
+    """
+    Best local matches for any of the queries, most similar first.
+    Returns dicts with uid, provider, path, duration, score.
+    Missing files are dropped from the index on the way.
+    """
+    exclude = exclude or set()
+    conn = _db()
+    uids, matrix = _load_matrix(conn)
+
+    if matrix is None or not queries:
+        return []
+
+    q = np.vstack([embed([query]) for query in queries])
+    scores = (matrix @ q.T).max(axis=1)
+
+    hits = []
+    for i in np.argsort(-scores):
+        if scores[i] < min_similarity or len(hits) >= n:
+            break
+
+        uid = uids[i]
+        if uid in exclude:
+            continue
+
+        row = conn.execute("SELECT * FROM clips WHERE uid = ?", (uid,)).fetchone()
+        if row is None:
+            continue
+
+        if row["duration"] is not None and row["duration"] < min_duration:
+            continue
+
+        if not os.path.exists(row["path"]):
+            remove_clip(uid)
+            continue
+
+        hits.append({
+            "uid": uid,
+            "provider": row["provider"],
+            "path": row["path"],
+            "duration": row["duration"],
+            "score": float(scores[i]),
+        })
+
+    return hits
+
+
+def stats() -> dict:
+    conn = _db()
+    clips = conn.execute("SELECT COUNT(*) FROM clips").fetchone()[0]
+    terms = conn.execute("SELECT COUNT(*) FROM clip_terms").fetchone()[0]
+    return {"clips": clips, "terms": terms}
+
+
+# -------------------------------------------------
+# BACKFILL (existing cache, no metadata yet)
+# -------------------------------------------------
+
+def unindexed_files(cache_dir: str) -> list[tuple[str, str, str]]:
+    """
+    (uid, provider, path) for provider clips in cache_dir not yet indexed.
+    """
+    conn = _db()
+    known = {r["uid"] for r in conn.execute("SELECT uid FROM clips")}
+
+    out = []
+    for name in os.listdir(cache_dir):
+        m = CLIP_NAME_RE.match(name)
+        if not m:
+            continue
+        uid = name[:-4]
+        if uid not in known:
+            out.append((uid, m.group(1), os.path.join(cache_dir, name)))
+    return out
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "stats"
+
+    if cmd == "backfill":
+        from src.bg_fetcher import backfill_index
+        added = backfill_index()
+        logger.info(f"📚 Indexed {added} cached clips")
+
+    print(json.dumps(stats(), indent=2))
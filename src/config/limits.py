@@ -0,0 +1,4 @@
+# Platform hard limits
+
+# YouTube Shorts safety cap (voice + CTA)
+MAX_SHORT_SECONDS = 59.0
@@ -0,0 +1,56 @@
+from dataclasses import dataclass
+import os
+
+
+@dataclass(frozen=True)
+class OutputTarget:
+    name: str
+    # File name inside a job's output folder
+    filename: str
+    max_seconds: float
+    # Upload size cap; None = quality-only (plain CRF)
+    max_bytes: int | None
+    crf: int
+    level: str
+    audio_bitrate_k: int
+    audio_rate: int
+
+
+PLATFORMS = {
+    "youtube_shorts": OutputTarget(
+        name="youtube_shorts",
+        filename="final_short.mp4",
+        max_seconds=59.0,
+        max_bytes=None,
+        crf=18,
+        level="4.2",
+        audio_bitrate_k=192,
+        audio_rate=44100,
+    ),
+    "instagram_reels": OutputTarget(
+        name="instagram_reels",
+        filename="final_reel.mp4",
+        max_seconds=90.0,
+        max_bytes=50 * 1024 * 1024,
+        crf=20,
+        level="4.2",
+        audio_bitrate_k=128,
+        audio_rate=48000,
+    ),
+}
+
+# Platforms every short is rendered for (one ffmpeg run)
+OUTPUT_PLATFORMS = [
+    p.strip() for p in os.getenv("OUTPUT_PLATFORMS", "youtube_shorts,instagram_reels").split(",")
+    if p.strip() in PLATFORMS
+]
+
+
+def get_targets(output_dir: str, names: list[str] | None = None) -> list[tuple[OutputTarget, str]]:
+    """
+    (target, output path) pairs for a job folder.
+    """
+    return [
+        (PLATFORMS[n], os.path.join(output_dir, PLATFORMS[n].filename))
+        for n in (names or OUTPUT_PLATFORMS or ["youtube_shorts"])
+    ]
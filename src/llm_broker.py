@@ -0,0 +1,161 @@
+# src/llm_broker.py
+import hashlib
+import itertools
+import os
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Future
+from dataclasses import dataclass, replace
+
+from filelock import FileLock
+
+# -------------------------------------------------
+# CONFIG
+# -------------------------------------------------
+
+# Max requests waiting for the backend (callers block when full)
+MAX_QUEUE = 32
+QUEUE_PUT_TIMEOUT_SEC = 60
+
+# Host-wide lock so separate pipeline processes take turns on the GPU
+BACKEND_LOCK_PATH = "assets/locks/llm_backend.lock"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LLMResult:
+    text: str
+    queue_wait: float      # seconds spent waiting (queue + other processes)
+    generate_s: float      # seconds the backend spent on this request
+    coalesced: bool = False
+
+
+@dataclass
+class _Job:
+    key: str
+    args: tuple
+    future: Future
+    enqueued_at: float
+
+
+def request_key(prompt: str, prefix: str | None = None) -> str:
+    h = hashlib.sha1()
+    h.update((prefix or "").encode("utf-8"))
+    h.update(b"\0")
+    h.update(prompt.encode("utf-8"))
+    return h.hexdigest()
+
+
+class LLMBroker:
+    """
+    Single owner of the LLM backend.
+
+    - Bounded priority queue (lower number = served first)
+    - One worker thread, plus a host-wide file lock, so GPU access is
+      serialized across threads AND processes — contention shows up as
+      queue wait, never as a backend failure
+    - Identical in-flight prompts collapse into one generation
+    """
+
+    def __init__(self, runner, max_queue: int = MAX_QUEUE, lock_path: str = BACKEND_LOCK_PATH):
+        self.runner = runner
+        self.lock_path = lock_path
+        self._queue = queue.PriorityQueue(maxsize=max_queue)
+        self._inflight: dict[str, _Job] = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._worker = None
+
+    # ---------------- PUBLIC ---------------- #
+
+    def generate(self, *args, key: str, priority: int = 1) -> LLMResult:
+        """
+        Runs runner(*args) through the broker and waits for the result.
+        Requests sharing `key` while one is in flight share its output.
+        """
+        submitted = time.time()
+        future, coalesced = self._submit(args, key, priority)
+
+        result = future.result()
+
+        # Per-caller timing: anything that wasn't generation was waiting
+        waited = max(0.0, time.time() - submitted - result.generate_s)
+        return replace(result, queue_wait=round(waited, 4), coalesced=coalesced)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    # ---------------- INTERNAL ---------------- #
+
+    def _submit(self, args: tuple, key: str, priority: int) -> tuple[Future, bool]:
+        with self._lock:
+            existing = self._inflight.get(key)
+            if existing is not None:
+                logger.info("🔗 Coalesced duplicate LLM request")
+                return existing.future, True
+
+            job = _Job(key=key, args=args, future=Future(), enqueued_at=time.time())
+            self._inflight[key] = job
+            self._ensure_worker()
+
+        try:
+            self._queue.put(
+                (priority, next(self._seq), job),
+                timeout=QUEUE_PUT_TIMEOUT_SEC
+            )
+        except queue.Full:
+            error = RuntimeError("LLM broker queue full")
+            # Callers that coalesced onto this job while we waited fail too
+            with self._lock:
+                job.future.set_exception(error)
+                if self._inflight.get(key) is job:
+                    del self._inflight[key]
+            raise error
+
+        return job.future, False
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+
+        self._worker = threading.Thread(
+            target=self._run,
+            name="llm-broker",
+            daemon=True,
+        )
+        self._worker.start()
+
+    def _run(self):
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+        backend_lock = FileLock(self.lock_path)
+
+        while True:
+            _, _, job = self._queue.get()
+
+            try:
+                with backend_lock:
+                    start = time.time()
+                    text = self.runner(*job.args)
+                    generate_s = time.time() - start
+
+                result = LLMResult(
+                    text=text,
+                    queue_wait=round(start - job.enqueued_at, 4),
+                    generate_s=round(generate_s, 4),
+                )
+                error = None
+            except Exception as e:
+                result, error = None, e
+
+            with self._lock:
+                self._inflight.pop(job.key, None)
+
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(result)
+
+            self._queue.task_done()
@@ -0,0 +1,262 @@
+# src/llm_router.py
+import random
+import threading
+import time
+import logging
+from collections import deque
+
+# -------------------------------------------------
+# CONFIG
+# -------------------------------------------------
+
+# Rolling window of outcomes used for failure rate / latency
+HEALTH_WINDOW = 10
+
+# Consecutive backend failures before the circuit opens
+FAILURE_THRESHOLD = 2
+
+# Failure rate (over the window) that marks a model unhealthy
+MAX_FAILURE_RATE = 0.5
+
+# Jittered exponential backoff (seconds)
+BACKOFF_BASE_SEC = 0.5
+BACKOFF_MAX_SEC = 8.0
+
+# Open-circuit cool-down before a probe (seconds)
+OPEN_BASE_SEC = 15.0
+OPEN_MAX_SEC = 300.0
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+logger = logging.getLogger(__name__)
+
+
+def jittered_backoff(attempt: int, base: float = BACKOFF_BASE_SEC, cap: float = BACKOFF_MAX_SEC) -> float:
+    """
+    Full-jitter exponential backoff.
+    attempt is 1-based.
+    """
+    ceiling = min(cap, base * (2 ** max(attempt - 1, 0)))
+    return random.uniform(0, ceiling)
+
+
+# -------------------------------------------------
+# PER-MODEL HEALTH
+# -------------------------------------------------
+
+class ModelHealth:
+    """
+    Circuit breaker + rolling health stats for one model.
+    Thread-safe.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=HEALTH_WINDOW)   # (ok, latency)
+        self.consecutive_failures = 0
+        self.open_count = 0
+        self.retry_at = 0.0
+        self.probing = False
+        self.last_error: str | None = None
+        self.last_error_at = 0.0
+        self._lock = threading.Lock()
+
+    # ---------------- STATS ---------------- #
+
+    def failure_rate(self) -> float:
+        with self._lock:
+            if not self.outcomes:
+                return 0.0
+            return sum(1 for ok, _ in self.outcomes if not ok) / len(self.outcomes)
+
+    def avg_latency(self) -> float | None:
+        with self._lock:
+            latencies = [lat for ok, lat in self.outcomes if ok]
+        return sum(latencies) / len(latencies) if latencies else None
+
+    def is_healthy(self) -> bool:
+        return self.state == CLOSED and self.failure_rate() < MAX_FAILURE_RATE
+
+    # ---------------- CIRCUIT ---------------- #
+
+    def allow(self) -> bool:
+        """
+        True if a request may be sent to this model right now.
+        An expired open circuit lets exactly one trial through (half-open).
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+
+            if self.state == OPEN and time.time() >= self.retry_at and not self.probing:
+                self.state = HALF_OPEN
+                return True
+
+            return False
+
+    def record_success(self, latency: float):
+        with self._lock:
+            if self.state != CLOSED:
+                # Recovered — old failures no longer describe this model
+                self.outcomes.clear()
+                logger.info(f"✅ Circuit closed for {self.model}")
+
+            self.outcomes.append((True, latency))
+            self.consecutive_failures = 0
+
+            self.state = CLOSED
+            self.open_count = 0
+
+    def record_failure(self, latency: float, error: str | None = None) -> bool:
+        """
+        Records a backend failure.
+        Returns True if this failure opened the circuit.
+        """
+        with self._lock:
+            self.outcomes.append((False, latency))
+            if error is not None:
+                self.last_error = error
+                self.last_error_at = time.time()
+            self.consecutive_failures += 1
+
+            should_open = (
+                self.state == HALF_OPEN
+                or self.consecutive_failures >= FAILURE_THRESHOLD
+            )
+
+            if not should_open or self.state == OPEN:
+                return False
+
+            self.open_count += 1
+            cool_down = min(
+                OPEN_MAX_SEC,
+                OPEN_BASE_SEC * (2 ** (self.open_count - 1))
+            )
+            cool_down *= random.uniform(0.8, 1.2)
+
+            self.state = OPEN
+            self.retry_at = time.time() + cool_down
+
+            logger.warning(
+                f"🚫 Circuit opened for {self.model} "
+                f"(retry in {cool_down:.0f}s)"
+            )
+            return True
+
+    def snapshot(self) -> dict:
+        rate = self.failure_rate()
+        latency = self.avg_latency()
+        return {
+            "state": self.state,
+            "failure_rate": round(rate, 3),
+            "avg_latency": round(latency, 3) if latency is not None else None,
+            "open_count": self.open_count,
+        }
+
+
+# -------------------------------------------------
+# ROUTER
+# -------------------------------------------------
+
+class ModelRouter:
+    """
+    Routes LLM calls across models in preference order,
+    skipping models whose circuit is open.
+
+    When a circuit opens, a background probe re-checks the
+    model after the cool-down so traffic can return to it
+    without a user request paying for the failure.
+    """
+
+    def __init__(self, models: list[str], probe=None):
+        self.models = list(models)
+        self.health = {m: ModelHealth(m) for m in self.models}
+        self.probe = probe
+
+    def candidates(self) -> list[str]:
+        """
+        Models to try, best first:
+        healthy models in preference order, then degraded ones.
+        Models with an open circuit are left out (empty = all open;
+        see open_error).
+        """
+        healthy = [m for m in self.models if self.health[m].is_healthy()]
+        degraded = [
+            m for m in self.models
+            if m not in healthy and self.health[m].state != OPEN
+        ]
+        return healthy + degraded
+
+    def open_error(self) -> RuntimeError:
+        """
+        Fail-fast error while no circuit admits a request: when each
+        model reopens and the last failure recorded for any of them.
+        """
+        retry = ", ".join(
+            f"{m} at {time.strftime('%H:%M:%S', time.localtime(self.health[m].retry_at))}"
+            for m in sorted(self.models, key=lambda m: self.health[m].retry_at)
+        )
+        latest = max(self.health.values(), key=lambda h: h.last_error_at)
+        return RuntimeError(f"All model circuits open (retry {retry}). Last failure: {latest.last_error}")
+
+    def allow(self, model: str) -> bool:
+        return self.health[model].allow()
+
+    def is_open(self, model: str) -> bool:
+        return self.health[model].state != CLOSED
+
+    def record_success(self, model: str, latency: float):
+        self.health[model].record_success(latency)
+
+    def record_failure(self, model: str, latency: float, error: str | None = None):
+        if self.health[model].record_failure(latency, error):
+            self._schedule_probe(model)
+
+    def snapshot(self) -> dict:
+        return {m: h.snapshot() for m, h in self.health.items()}
+
+    # ---------------- BACKGROUND PROBE ---------------- #
+
+    def _schedule_probe(self, model: str):
+        if self.probe is None:
+            return
+
+        health = self.health[model]
+        with health._lock:
+            if health.probing:
+                return
+            health.probing = True
+
+        threading.Thread(
+            target=self._probe_loop,
+            args=(model,),
+            name=f"llm-probe-{model}",
+            daemon=True,
+        ).start()
+
+    def _probe_loop(self, model: str):
+        health = self.health[model]
+
+        while True:
+            time.sleep(max(0.0, health.retry_at - time.time()))
+
+            with health._lock:
+                if health.state == CLOSED:
+                    health.probing = False
+                    return
+                health.state = HALF_OPEN
+
+            start = time.time()
+            try:
+                logger.info(f"🩺 Probing {model}")
+                self.probe(model)
+                health.record_success(time.time() - start)
+                with health._lock:
+                    health.probing = False
+                return
+            except Exception as e:
+                logger.warning(f"🩺 Probe failed for {model}: {e}")
+                health.record_failure(time.time() - start, str(e))
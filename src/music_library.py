@@ -0,0 +1,355 @@
+# src/music_library.py
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from src.utils.audio_utils import get_audio_duration, decode_pcm, encode_pcm, SAMPLE_RATE
+from src.utils.db import connect
+from src.utils.logger import logger
+
+# -------------------------------------------------
+# CONFIG
+# -------------------------------------------------
+
+INDEX_PATH = "assets/music_cache/library.db"
+STEM_DIR = "assets/music_cache/stems"
+
+# Canonical stem: covers the longest short, no looping at render time
+STEM_SECONDS = 60.0
+STEM_CROSSFADE_SEC = 2.0
+STEM_PEAK = 10 ** (-1.0 / 20)  # -1 dBFS
+STEM_CODEC = ["-c:a", "aac", "-b:a", "192k"]
+
+# Music bed level under the voice (the old fixed volume=0.20 ≈ -14 dB
+# on a typical -14 LUFS track)
+MUSIC_TARGET_LUFS = -28.0
+
+# Never boost quiet tracks into hiss, never mute loud ones
+MIN_GAIN_DB = -30.0
+MAX_GAIN_DB = 6.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    path TEXT PRIMARY KEY,
+    uid TEXT NOT NULL,
+    mood TEXT,
+    keyword TEXT,
+    duration REAL,
+    loudness REAL,
+    true_peak REAL,
+    stem_path TEXT,
+    stem_loudness REAL,
+    added_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tracks_keyword ON tracks(keyword);
+"""
+
+_mem_lock = threading.Lock()
+_mem = {"version": None, "by_keyword": {}, "by_path": {}, "all": [], "pools": {}}
+
+
+def _db():
+    conn = connect(INDEX_PATH)
+    conn.executescript(SCHEMA)
+
+    # Libraries indexed before stems existed
+    columns = {r["name"] for r in conn.execute("PRAGMA table_info(tracks)")}
+    for name, kind in (("stem_path", "TEXT"), ("stem_loudness", "REAL")):
+        if name not in columns:
+            conn.execute(f"ALTER TABLE tracks ADD COLUMN {name} {kind}")
+
+    return conn
+
+
+# -------------------------------------------------
+# ANALYSIS (once per track)
+# -------------------------------------------------
+
+def measure_loudness(path: str) -> tuple[float | None, float | None]:
+    """
+    Integrated loudness (LUFS) and true peak (dBTP), EBU R128.
+    """
+    result = subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-nostats", "-i", path,
+            "-af", "loudnorm=print_format=json",
+            "-f", "null", "-"
+        ],
+        capture_output=True, text=True
+    )
+
+    m = re.search(r"\{[^{}]*\"input_i\"[^{}]*\}", result.stderr)
+    if not m:
+        return None, None
+
+    data = json.loads(m.group(0))
+    try:
+        loudness = float(data["input_i"])
+        peak = float(data["input_tp"])
+    except (KeyError, ValueError):
+        return None, None
+
+    # Silence reports -inf
+    if loudness == float("-inf"):
+        return None, None
+    return loudness, peak
+
+
+def _equal_power(n: int) -> tuple[np.ndarray, np.ndarray]:
+    t = np.linspace(0.0, np.pi / 2, n, dtype=np.float32)[:, None]
+    return np.sin(t), np.cos(t)  # fade in, fade out
+
+
+def _crossfade_concat(a: np.ndarray, b: np.ndarray, n: int) -> np.ndarray:
+    fade_in, fade_out = _equal_power(n)
+    mid = a[-n:] * fade_out + b[:n] * fade_in
+    return np.concatenate([a[:-n], mid, b[n:]])
+
+
+def _loop_stem(x: np.ndarray, seconds: float, crossfade: float) -> np.ndarray:
+    """
+    Exactly `seconds` long and seamless when looped: short tracks are
+    chained with crossfades, then the tail past the end is folded over
+    the start.
+    """
+    length = int(seconds * SAMPLE_RATE)
+    n = min(int(crossfade * SAMPLE_RATE), len(x) // 4)
+
+    y = x
+    while len(y) < length + n:
+        y = _crossfade_concat(y, x, n)
+    y = y[:length + n]
+
+    fade_in, fade_out = _equal_power(n)
+    start = y[:n] * fade_in + y[length:length + n] * fade_out
+    return np.concatenate([start, y[n:length]])
+
+
+def build_stem(path: str, loudness: float | None) -> tuple[str, float | None]:
+    """
+    Canonical music stem for path: STEM_SECONDS of 44.1 kHz stereo AAC,
+    loop-crossfaded, normalized to MUSIC_TARGET_LUFS, peaks ≤ -1 dBFS.
+    Returns (stem path, measured stem loudness).
+    """
+    os.makedirs(STEM_DIR, exist_ok=True)
+    name = os.path.splitext(os.path.basename(path))[0]
+    stem = os.path.join(STEM_DIR, f"{name}.m4a")
+
+    x = decode_pcm(path)
+    if len(x) < SAMPLE_RATE:
+        raise RuntimeError(f"Track too short for a stem: {path}")
+
+    y = _loop_stem(x, STEM_SECONDS, STEM_CROSSFADE_SEC)
+
+    if loudness is not None:
+        y = y * np.float32(10 ** ((MUSIC_TARGET_LUFS - loudness) / 20))
+
+    peak = float(np.abs(y).max())
+    if peak > STEM_PEAK:
+        y = y * np.float32(STEM_PEAK / peak)
+
+    tmp = f"{stem}.{os.getpid()}.tmp.m4a"
+    try:
+        encode_pcm(y, tmp, codec_args=STEM_CODEC)
+        os.replace(tmp, stem)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    stem_loudness, _ = measure_loudness(stem)
+    return stem, stem_loudness
+
+
+# -------------------------------------------------
+# IN-MEMORY VIEW
+# -------------------------------------------------
+
+def _load(conn) -> dict:
+    version = tuple(conn.execute("SELECT COUNT(*), MAX(rowid) FROM tracks").fetchone())
+
+    with _mem_lock:
+        if _mem["version"] != version:
+            rows = [dict(r) for r in conn.execute("SELECT * FROM tracks")]
+            by_keyword: dict[str, list[dict]] = {}
+            for r in rows:
+                by_keyword.setdefault(r["keyword"], []).append(r)
+
+            _mem["by_keyword"] = by_keyword
+            _mem["by_path"] = {r["path"]: r for r in rows}
+            _mem["all"] = rows
+            _mem["pools"] = {}
+            _mem["version"] = version
+
+        return _mem
+
+
+# -------------------------------------------------
+# WRITE
+# -------------------------------------------------
+
+def add_track(path: str, uid: str, mood: str | None, keyword: str | None) -> bool:
+    """
+    Indexes a cached track. Duration and loudness are probed once.
+    Returns False if it was already indexed.
+    """
+    conn = _db()
+    if conn.execute("SELECT 1 FROM tracks WHERE path = ?", (path,)).fetchone():
+        return False
+
+    try:
+        duration = get_audio_duration(path)
+    except Exception:
+        duration = None
+
+    loudness, peak = measure_loudness(path)
+
+    try:
+        stem, stem_loudness = build_stem(path, loudness)
+    except Exception as e:
+        logger.warning(f"🎼 Stem build failed for {path}: {e}")
+        stem, stem_loudness = None, None
+
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO tracks "
+            "(path, uid, mood, keyword, duration, loudness, true_peak, "
+            "stem_path, stem_loudness, added_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                path, uid, mood, keyword, duration, loudness, peak,
+                stem, stem_loudness, time.time(),
+            ),
+        )
+    return True
+
+
+def remove_track(path: str):
+    conn = _db()
+    with conn:
+        conn.execute("DELETE FROM tracks WHERE path = ?", (path,))
+
+
+def prune_missing() -> int:
+    """
+    Drops rows whose file is gone (evicted / deleted by hand).
+    """
+    conn = _db()
+    gone = [
+        (r["path"],) for r in conn.execute("SELECT path FROM tracks")
+        if not os.path.exists(r["path"])
+    ]
+    with conn:
+        conn.executemany("DELETE FROM tracks WHERE path = ?", gone)
+    return len(gone)
+
+
+# -------------------------------------------------
+# READ
+# -------------------------------------------------
+
+def pick(keywords: list[str] | None = None, exclude: set[str] | None = None) -> dict | None:
+    """
+    Random indexed track for any of the keywords (None = any track),
+    skipping uids in exclude. Missing files are dropped on the way.
+    """
+    exclude = exclude or set()
+    mem = _load(_db())
+
+    if keywords is None:
+        pool = mem["all"]
+    else:
+        key = tuple(sorted(keywords))
+        with _mem_lock:
+            pool = mem["pools"].get(key)
+            if pool is None:
+                pool = [t for kw in key for t in mem["by_keyword"].get(kw, [])]
+                mem["pools"][key] = pool
+
+    # A few O(1) draws first; full filter only if they keep hitting exclusions
+    for _ in range(8):
+        if not pool:
+            return None
+        track = random.choice(pool)
+        if track["uid"] in exclude:
+            continue
+        if not os.path.exists(track["path"]):
+            remove_track(track["path"])
+            pool = [t for t in pool if t is not track]
+            continue
+        return track
+
+    rest = [t for t in pool if t["uid"] not in exclude and os.path.exists(t["path"])]
+    return random.choice(rest) if rest else None
+
+
+def gain_db(path: str) -> float | None:
+    """
+    Gain that brings the track to MUSIC_TARGET_LUFS (None if unknown).
+    """
+    track = _load(_db())["by_path"].get(path)
+    if not track or track["loudness"] is None:
+        return None
+
+    gain = MUSIC_TARGET_LUFS - track["loudness"]
+    return max(MIN_GAIN_DB, min(MAX_GAIN_DB, gain))
+
+
+def stem_for(path: str) -> tuple[str, float] | None:
+    """
+    (stem path, gain dB) ready to mix for an indexed track; the stem is
+    (re)built if it is missing. None if the track has no usable stem.
+    """
+    conn = _db()
+    row = conn.execute(
+        "SELECT loudness, stem_path, stem_loudness FROM tracks WHERE path = ?", (path,)
+    ).fetchone()
+    if row is None:
+        return None
+
+    stem, stem_loudness = row["stem_path"], row["stem_loudness"]
+
+    # Evicted, or indexed before stems existed
+    if not stem or not os.path.exists(stem):
+        try:
+            stem, stem_loudness = build_stem(path, row["loudness"])
+        except Exception as e:
+            logger.warning(f"🎼 Stem build failed for {path}: {e}")
+            return None
+
+        with conn:
+            conn.execute(
+                "UPDATE tracks SET stem_path = ?, stem_loudness = ? WHERE path = ?",
+                (stem, stem_loudness, path),
+            )
+
+    # Residual correction only (stems are already near the target)
+    gain = 0.0 if stem_loudness is None else MUSIC_TARGET_LUFS - stem_loudness
+    return stem, max(MIN_GAIN_DB, min(MAX_GAIN_DB, gain))
+
+
+def stats() -> dict:
+    mem = _load(_db())
+    return {
+        "tracks": len(mem["all"]),
+        "keywords": {kw: len(ts) for kw, ts in sorted(mem["by_keyword"].items(), key=lambda x: str(x[0]))},
+        "unmeasured": sum(1 for t in mem["all"] if t["loudness"] is None),
+        "stems": sum(1 for t in mem["all"] if t.get("stem_path")),
+    }
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "stats"
+
+    if cmd == "rebuild":
+        from src.bg_music_fetcher import backfill_library
+        added = backfill_library()
+        logger.info(f"🎼 Indexed {added} cached tracks")
+
+    print(json.dumps(stats(), indent=2))
@@ -1,14 +1,23 @@
 # src/ollama_llm.py
-import subprocess
+import hashlib
+import json
+import os
 import time
 import logging
 import re
 
+import requests
+
+from src.llm_broker import LLMBroker, LLMResult, request_key
+from src.llm_router import ModelRouter, jittered_backoff
+from src.utils import perf
+
 # -------------------------------------------------
 # CONFIG
 # -------------------------------------------------
 
-OLLAMA_PATH = r"C:\Users\rsr26\AppData\Local\Programs\Ollama\ollama.exe"
+# Local Ollama server (HTTP API exposes token counts + timings)
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434")
 
 # GPU-first (primary model)
 GPU_MODEL = "llama3.1:8b"
@@ -16,13 +25,31 @@ GPU_MODEL = "llama3.1:8b"
 # CPU-safe fallback (lighter, stable)
 CPU_MODEL = "llama3.2:3b"
 
-# Retry config
+# Retry config (per model; backoff is jittered exponential)
 OLLAMA_RETRIES = 2
-RETRY_DELAY_SEC = 2
+
+# Hard wall-clock cap per generation (a hung runner counts as failure)
+OLLAMA_TIMEOUT_SEC = 180
+PROBE_TIMEOUT_SEC = 30
+
+# Keep the model (and its prompt KV cache) resident between calls
+OLLAMA_KEEP_ALIVE = "30m"
 
 # Minimum acceptable output length (Shorts-safe)
 MIN_WORDS = 90
 
+# Call-site tags for instrumentation
+CALL_SCRIPT = "script_candidate"
+CALL_HOOK = "hook_rewrite"
+CALL_SENTENCE = "sentence_rewrite"
+
+# Broker priority (lower = sooner): rewrites finish jobs already in progress
+CALL_PRIORITY = {
+    CALL_HOOK: 0,
+    CALL_SENTENCE: 0,
+    CALL_SCRIPT: 1,
+}
+
 logger = logging.getLogger(__name__)
 
 
@@ -65,82 +92,290 @@ def _clean_llm_output(text: str) -> str:
     return " ".join(cleaned).strip()
 
 
+class WeakResponseError(RuntimeError):
+    """
+    The model answered, but the content was unusable.
+    Does NOT count against model health.
+    """
+
+
 # -------------------------------------------------
 # INTERNAL RUNNER
 # -------------------------------------------------
 
-def _run_ollama(model: str, prompt: str) -> str:
+def _ns(value) -> float | None:
+    return round(value / 1e9, 4) if value else None
+
+
+def _build_system(prefix: str | None) -> str:
     """
-    Runs ollama once with the given model.
-    Raises RuntimeError on failure.
+    Stable system block: SYSTEM_INSTRUCTION + optional shared prefix
+    (e.g. analytics insights). Byte-identical across a batch so Ollama
+    reuses the KV cache for it instead of re-evaluating.
     """
+    system = SYSTEM_INSTRUCTION.strip()
+    if prefix and prefix.strip():
+        system += "\n\n" + prefix.strip()
+    return system
 
-    full_prompt = SYSTEM_INSTRUCTION.strip() + "\n\n" + prompt.strip()
 
-    result = subprocess.run(
-        [OLLAMA_PATH, "run", model],
-        input=full_prompt,
-        text=True,
-        capture_output=True,
-        encoding="utf-8",
-        errors="ignore"
-    )
+def _generate(model: str, prompt: str, system: str | None = None) -> tuple[str, dict]:
+    """
+    Streams one generation from the Ollama HTTP API.
+    Returns (raw_text, stats). Raises RuntimeError on backend failure.
+    """
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": True,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+    }
+    if system:
+        payload["system"] = system
+
+    start = time.time()
+    first_token_at = None
+    parts = []
+    final = {}
+
+    with requests.post(
+        f"{OLLAMA_URL}/api/generate",
+        json=payload,
+        stream=True,
+        timeout=(5, OLLAMA_TIMEOUT_SEC),
+    ) as r:
+        if r.status_code != 200:
+            raise RuntimeError(f"Ollama HTTP {r.status_code}: {r.text[:200]}")
+
+        for line in r.iter_lines():
+            if not line:
+                continue
+
+            chunk = json.loads(line)
+            if chunk.get("error"):
+                raise RuntimeError(chunk["error"])
+
+            token = chunk.get("response", "")
+            if token:
+                if first_token_at is None:
+                    first_token_at = time.time()
+                parts.append(token)
+
+            if chunk.get("done"):
+                final = chunk
+                break
+
+            if time.time() - start > OLLAMA_TIMEOUT_SEC:
+                raise RuntimeError("Ollama generation timed out")
+
+    eval_count = final.get("eval_count")
+    eval_duration = final.get("eval_duration")
+
+    stats = {
+        "prompt_tokens": final.get("prompt_eval_count"),
+        "eval_tokens": eval_count,
+        "ttft": round(first_token_at - start, 4) if first_token_at else None,
+        "load_s": _ns(final.get("load_duration")),
+        "prompt_eval_s": _ns(final.get("prompt_eval_duration")),
+        "eval_s": _ns(eval_duration),
+        "tokens_per_sec": (
+            round(eval_count / (eval_duration / 1e9), 2)
+            if eval_count and eval_duration else None
+        ),
+        "total_s": round(time.time() - start, 4),
+    }
+
+    return "".join(parts), stats
+
+
+def _record_call(call_site: str, model: str, stats: dict, accepted: bool, error: str | None = None):
+    entry = {
+        "call_site": call_site,
+        "model": model,
+        "accepted": accepted,
+        "error": error,
+        **stats,
+    }
+    perf.record("llm", entry)
+
+    summary = {
+        k: stats.get(k)
+        for k in ("prompt_tokens", "eval_tokens", "ttft", "tokens_per_sec", "total_s")
+    }
+    # Tokens spent on output we threw away
+    summary["wasted_tokens"] = 0 if accepted else (stats.get("eval_tokens") or 0)
+    summary["accepted"] = 1 if accepted else 0
+
+    try:
+        perf.update_summary("llm", f"{call_site}:{model}", summary)
+    except OSError as e:
+        logger.debug(f"LLM summary not written: {e}")
+
+
+def _run_ollama(
+    model: str,
+    prompt: str,
+    call_site: str = CALL_SCRIPT,
+    prefix: str | None = None
+) -> str:
+    """
+    Runs ollama once with the given model.
+    Raises RuntimeError on backend failure,
+    WeakResponseError on unusable output.
+    Every call is recorded in the perf report, tagged by call site.
+    """
 
-    if result.returncode != 0:
-        raise RuntimeError(result.stderr.strip())
+    system = _build_system(prefix)
 
-    output = _clean_llm_output(result.stdout.strip())
+    start = time.time()
+    try:
+        raw, stats = _generate(model, prompt.strip(), system=system)
+        stats["prefix_hash"] = hashlib.sha1(system.encode("utf-8")).hexdigest()[:10]
+    except Exception as e:
+        _record_call(
+            call_site, model,
+            {"total_s": round(time.time() - start, 4)},
+            accepted=False, error=str(e)
+        )
+        raise RuntimeError(str(e)) from e
 
+    output = _clean_llm_output(raw.strip())
+
+    error = None
     if not output:
-        raise RuntimeError("LLM returned empty response")
+        error = "LLM returned empty response"
+    elif len(output.split()) < MIN_WORDS:
+        error = "LLM returned weak or incomplete response"
+
+    _record_call(call_site, model, stats, accepted=error is None, error=error)
 
-    if len(output.split()) < MIN_WORDS:
-        raise RuntimeError("LLM returned weak or incomplete response")
+    if error:
+        raise WeakResponseError(error)
 
     return output
 
 
-# -------------------------------------------------
-# PUBLIC API
-# -------------------------------------------------
-
-def generate_short_script(prompt: str) -> str:
+def _probe_model(model: str):
     """
-    GPU-first script generation with CPU fallback.
-    Returns clean spoken text or raises a clear error.
+    Cheap liveness check used by the router's background probe.
     """
+    r = requests.post(
+        f"{OLLAMA_URL}/api/generate",
+        json={
+            "model": model,
+            "prompt": "Reply with the single word OK.",
+            "stream": False,
+            "options": {"num_predict": 2},
+        },
+        timeout=PROBE_TIMEOUT_SEC,
+    )
 
-    last_error = None
+    if r.status_code != 200 or not r.json().get("response", "").strip():
+        raise RuntimeError(f"probe failed (HTTP {r.status_code})")
 
-    # -------------------------------
-    # 1️⃣ TRY GPU MODEL
-    # -------------------------------
-    for attempt in range(1, OLLAMA_RETRIES + 1):
-        try:
-            logger.info(f"🧠 Ollama GPU attempt {attempt}")
-            return _run_ollama(GPU_MODEL, prompt)
-        except Exception as e:
-            last_error = str(e)
-            logger.warning(f"⚠️ GPU attempt {attempt} failed: {e}")
-            time.sleep(RETRY_DELAY_SEC)
 
-    logger.warning("🔥 GPU model failed, falling back to CPU model")
+# GPU model preferred; CPU model takes traffic while GPU circuit is open
+ROUTER = ModelRouter([GPU_MODEL, CPU_MODEL], probe=_probe_model)
 
-    # -------------------------------
-    # 2️⃣ CPU FALLBACK
-    # -------------------------------
-    for attempt in range(1, OLLAMA_RETRIES + 1):
-        try:
-            logger.info(f"🧠 Ollama CPU attempt {attempt}")
-            return _run_ollama(CPU_MODEL, prompt)
-        except Exception as e:
-            last_error = str(e)
-            logger.warning(f"⚠️ CPU attempt {attempt} failed: {e}")
-            time.sleep(RETRY_DELAY_SEC)
+
+def _generate_routed(prompt: str, call_site: str, prefix: str | None) -> str:
+    """
+    Health-routed generation.
+    GPU model first while healthy; traffic goes straight to the
+    CPU model when the GPU circuit is open.
+    Runs on the broker worker only.
+    """
+
+    last_error = None
+    tried = False
+
+    for model in ROUTER.candidates():
+        for attempt in range(1, OLLAMA_RETRIES + 1):
+            if not ROUTER.allow(model):
+                logger.info(f"⏭️ Skipping {model} (circuit open)")
+                break
+
+            tried = True
+            start = time.time()
+            try:
+                logger.info(f"🧠 Ollama {model} attempt {attempt}")
+                output = _run_ollama(model, prompt, call_site, prefix)
+                ROUTER.record_success(model, time.time() - start)
+                return output
+            except WeakResponseError as e:
+                # Model is alive — content problem, not a health problem
+                ROUTER.record_success(model, time.time() - start)
+                last_error = str(e)
+                logger.warning(f"⚠️ {model} attempt {attempt} weak: {e}")
+            except Exception as e:
+                ROUTER.record_failure(model, time.time() - start, str(e))
+                last_error = str(e)
+                logger.warning(f"⚠️ {model} attempt {attempt} failed: {e}")
+
+                if attempt < OLLAMA_RETRIES and not ROUTER.is_open(model):
+                    time.sleep(jittered_backoff(attempt))
+
+        logger.warning(f"🔥 {model} exhausted, trying next model")
 
     # -------------------------------
     # ❌ TOTAL FAILURE
     # -------------------------------
+    if not tried:
+        # Every circuit open (or mid-probe): fail fast with the real cause
+        raise ROUTER.open_error()
+
     raise RuntimeError(
-        f"Ollama failed after GPU + CPU attempts. Last error: {last_error}"
+        f"Ollama failed on all models. Last error: {last_error}"
+    )
+
+
+# Sole owner of the backend for this process
+BROKER = LLMBroker(_generate_routed)
+
+
+# -------------------------------------------------
+# PUBLIC API
+# -------------------------------------------------
+
+def generate_with_stats(
+    prompt: str,
+    call_site: str = CALL_SCRIPT,
+    prefix: str | None = None,
+    priority: int | None = None
+) -> LLMResult:
+    """
+    Brokered generation. Returns text plus queue-wait vs generate time.
+    Identical prompts already in flight share a single generation.
+    """
+    if priority is None:
+        priority = CALL_PRIORITY.get(call_site, 1)
+
+    result = BROKER.generate(
+        prompt, call_site, prefix,
+        key=request_key(prompt, prefix),
+        priority=priority,
     )
+
+    perf.record("llm_broker", {
+        "call_site": call_site,
+        "queue_wait": result.queue_wait,
+        "generate_s": result.generate_s,
+        "coalesced": result.coalesced,
+    })
+
+    return result
+
+
+def generate_short_script(
+    prompt: str,
+    call_site: str = CALL_SCRIPT,
+    prefix: str | None = None
+) -> str:
+    """
+    GPU-first script generation with CPU fallback.
+
+    prefix: constant block shared by every call in a batch; sent with
+    SYSTEM_INSTRUCTION as the system message so its evaluation is reused.
+    Returns clean spoken text or raises a clear error.
+    """
+    return generate_with_stats(prompt, call_site, prefix).text
@@ -2,107 +2,256 @@ import sys
 import os
 import json
 import uuid
-import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 from src.services.script_service import generate_script
 from src.services.tts_service import speak
-from src.services.cta_service import generate_cta
-from src.services.background_service import build_background
+from src.services.cta_service import generate_cta, cta_reserve
+from src.services.background_service import (
+    start_background, finish_background, expected_duration, record_duration
+)
 from src.services.metadata_service import build_metadata
+from src.services.prefetch_service import Prefetcher
 
 from src.captions_whisper import generate_word_level_srt
 from src.utils.srt_to_ass import srt_to_ass
 from src.render import render_video
 from src.bg_music_fetcher import fetch_background_music
+from src import music_library
 from src.utils.logger import logger
-from src.utils.audio_utils import get_audio_duration
+from src.utils.audio_buffer import AudioBuffer
+from src.audio_mix import mix_audio
+from src.utils import perf, cache_manager
+from src.config.languages import get_random_voice
+from src.config.limits import MAX_SHORT_SECONDS
+from src.config.platforms import get_targets
+from src.speech_duration import observe
+from src.text_utils import sanitize_for_tts
 
+# Music fetch runs alongside script + TTS (see _generate)
+_music_stage = ThreadPoolExecutor(max_workers=1, thread_name_prefix="music-stage")
 
-def generate_short(idea: str, lang: str = "en"):
-    logger.info(f"🎯 IDEA: {idea} | LANG: {lang}")
+
+def _log_llm_summary():
+    calls = perf.snapshot()["events"].get("llm", [])
+    if not calls:
+        return
+
+    by_site = {}
+    for c in calls:
+        site = by_site.setdefault(c["call_site"], {"calls": 0, "prompt": 0, "eval": 0, "wasted": 0})
+        site["calls"] += 1
+        site["prompt"] += c.get("prompt_tokens") or 0
+        site["eval"] += c.get("eval_tokens") or 0
+        if not c["accepted"]:
+            site["wasted"] += c.get("eval_tokens") or 0
+
+    for name, s in by_site.items():
+        logger.info(
+            f"📊 LLM {name}: {s['calls']} calls | "
+            f"prompt {s['prompt']} tok | gen {s['eval']} tok | "
+            f"wasted {s['wasted']} tok"
+        )
+
+
+def generate_short(idea: str, lang: str | list[str] = "en"):
+    """
+    One short per language. Several languages share one background and
+    one music bed (sized to the longest voice track); script, TTS and
+    captions run per language in parallel.
+    """
+    langs = [lang] if isinstance(lang, str) else list(dict.fromkeys(lang))
+    logger.info(f"🎯 IDEA: {idea} | LANG: {', '.join(langs)}")
 
     # ---------------- SETUP ---------------- #
     video_id = uuid.uuid4().hex[:8]
     output_dir = os.path.join("outputs", video_id)
     os.makedirs(output_dir, exist_ok=True)
+    perf.start_job(video_id)
+    cache_manager.lease(output_dir)
+
+    try:
+        _generate(idea, langs, output_dir)
+    finally:
+        cache_manager.release_leases()
+
+    # Keep render nodes within their disk budgets
+    try:
+        cache_manager.evict()
+    except Exception as e:
+        logger.warning(f"🧹 Cache eviction failed: {e}")
+
+
+def _voice_track(idea: str, lang: str, lang_dir: str) -> dict:
+    """
+    Script, voice (body + CTA, in memory) and captions for one language.
+    """
+    # Voice is fixed up front so durations can be predicted before TTS
+    voice = get_random_voice(lang)
 
     # ---------------- SCRIPT ---------------- #
-    script = generate_script(idea, lang)
+    script = generate_script(
+        idea,
+        lang,
+        voice=voice,
+        max_seconds=MAX_SHORT_SECONDS - cta_reserve(voice, lang)
+    )
     sentences = [s for s in script.split(".") if len(s.strip().split()) >= 4]
 
     # ---------------- BODY VOICE ---------------- #
-    body_audio = speak(script, lang)
-    body_duration = get_audio_duration(body_audio)
+    body_audio = speak(script, lang, voice=voice)
+    cache_manager.lease(body_audio)
+    # Decoded once; duration, captions and the mix all read this buffer
+    body_pcm = AudioBuffer.from_file(body_audio)
+    body_duration = body_pcm.duration
+    observe(sanitize_for_tts(script), voice, body_duration)
 
     # ---------------- CTA ---------------- #
     cta_text, cta_audio, cta_duration = generate_cta(
         idea=idea,
-        body_duration=body_duration
+        body_duration=body_duration,
+        voice=voice,
+        lang=lang
     )
 
-    # ---------------- MERGE AUDIO ---------------- #
-    final_voice = os.path.join(output_dir, "voice.wav")
-    concat_list = os.path.join(output_dir, "concat.txt")
-
-    with open(concat_list, "w", encoding="utf-8") as f:
-        f.write(f"file '{os.path.abspath(body_audio)}'\n")
-        if cta_audio:
-            f.write(f"file '{os.path.abspath(cta_audio)}'\n")
-
-    subprocess.run(
-        [
-            "ffmpeg", "-y",
-            "-f", "concat", "-safe", "0",
-            "-i", concat_list,
-            "-c", "copy",
-            final_voice
-        ],
-        check=True
-    )
-
-    total_duration = min(
-        get_audio_duration(final_voice),
-        59.0
-    )
+    # ---------------- MERGE AUDIO (in memory) ---------------- #
+    # CTA buffer is already registered by generate_cta's duration check
+    voice_pcm = AudioBuffer.concat([
+        body_pcm,
+        AudioBuffer.from_file(cta_audio) if cta_audio else None
+    ])
 
     # ---------------- CAPTIONS ---------------- #
     subtitles_path = None
     try:
-        srt = os.path.join(output_dir, "captions.srt")
-        generate_word_level_srt(final_voice, srt)
+        srt = os.path.join(lang_dir, "captions.srt")
+        generate_word_level_srt(voice_pcm, srt)
         ass = srt_to_ass(srt)
         if ass and os.path.exists(ass):
             subtitles_path = ass
     except Exception as e:
-        logger.warning(f"⚠️ Caption generation failed: {e}")
+        logger.warning(f"⚠️ Caption generation failed ({lang}): {e}")
+
+    return {
+        "lang": lang,
+        "dir": lang_dir,
+        "script": script,
+        "sentences": sentences,
+        "voice_pcm": voice_pcm,
+        # Safety net only — the script is already sized to fit
+        "duration": min(voice_pcm.duration, MAX_SHORT_SECONDS),
+        "subtitles_path": subtitles_path,
+    }
+
 
-    # ---------------- BACKGROUND ---------------- #
-    bg_video = build_background(
+def _generate(idea: str, langs: list[str], output_dir: str):
+
+    # ---------------- SPECULATIVE START ---------------- #
+    # Background and music depend only on the idea, so both start now and
+    # overlap LLM + TTS. Footage is sized from recent shorts' length
+    # (MAX_SHORT_SECONDS is only the script's upper budget).
+    bg_future = start_background(idea, expected_duration(), output_dir)
+    music_future = _music_stage.submit(fetch_background_music, idea)
+
+    # ---------------- VOICE TRACKS (per language) ---------------- #
+    # Single-language jobs keep the flat outputs/<id>/ layout
+    lang_dirs = {
+        lang: output_dir if len(langs) == 1 else os.path.join(output_dir, lang)
+        for lang in langs
+    }
+    for d in lang_dirs.values():
+        os.makedirs(d, exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers=len(langs), thread_name_prefix="lang") as pool:
+        futures = {lang: pool.submit(_voice_track, idea, lang, lang_dirs[lang]) for lang in langs}
+
+    tracks = []
+    for lang, fut in futures.items():
+        try:
+            tracks.append(fut.result())
+        except Exception as e:
+            if len(langs) == 1:
+                raise
+            logger.error(f"❌ {lang} voice track failed: {e}")
+    if not tracks:
+        raise RuntimeError("No language produced a voice track")
+
+    longest = max(tracks, key=lambda t: t["duration"])
+    record_duration(longest["duration"])
+
+    # ---------------- BACKGROUND (shared) ---------------- #
+    bg_video = finish_background(
+        bg_future,
         idea=idea,
-        sentences=sentences,
-        duration=total_duration,
+        sentences=longest["sentences"],
+        duration=longest["duration"],
         output_dir=output_dir
     )
 
-    # ---------------- MUSIC ---------------- #
-    music = fetch_background_music(idea)
-
-    # ---------------- METADATA ---------------- #
-    metadata = build_metadata(idea, script)
-    with open(os.path.join(output_dir, "metadata.json"), "w", encoding="utf-8") as f:
-        json.dump(metadata, f, indent=2, ensure_ascii=False)
-
-    # ---------------- RENDER ---------------- #
-    render_video(
-        bg_video=bg_video,
-        audio_file=final_voice,
-        music_file=music,
-        output_file=os.path.join(output_dir, "final_short.mp4"),
-        duration=total_duration,
-        subtitles_path=subtitles_path
-    )
+    # ---------------- MUSIC (shared) ---------------- #
+    music = music_future.result()
+    cache_manager.lease(music)
+
+    # Pre-conditioned stem when the library has one (no loop/resample)
+    stem = music_library.stem_for(music)
+    if stem:
+        music_file, music_gain = stem
+        cache_manager.lease(music_file)
+    else:
+        music_file, music_gain = music, music_library.gain_db(music)
+
+    # Decoded once for every language's mix
+    music_pcm = AudioBuffer.from_file(music_file, channels=2)
 
-    logger.info(f"✅ SHORT GENERATED → {output_dir}")
+    for track in tracks:
+        # ---------------- METADATA ---------------- #
+        metadata = build_metadata(idea, track["script"])
+        with open(os.path.join(track["dir"], "metadata.json"), "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2, ensure_ascii=False)
+
+        # ---------------- RENDER ---------------- #
+        audio_pcm = mix_audio(
+            track["voice_pcm"],
+            music_pcm,
+            track["duration"],
+            music_gain_db=music_gain,
+            music_is_stem=stem is not None
+        )
+
+        outputs = render_video(
+            bg_video=bg_video,
+            audio_file=None,
+            music_file=None,
+            output_file=None,
+            duration=track["duration"],
+            subtitles_path=track["subtitles_path"],
+            audio_pcm=audio_pcm,
+            targets=get_targets(track["dir"])
+        )
+
+        logger.info(f"✅ SHORT GENERATED ({track['lang']}) → {', '.join(outputs)}")
+
+    _log_llm_summary()
+    perf.write_report(os.path.join(output_dir, "perf.json"))
+
+
+def generate_batch(ideas: list[str], lang: str | list[str] = "en"):
+    """
+    Generates shorts one after another while a prefetcher fetches
+    stock clips and music for the ideas still waiting in the queue.
+    """
+    prefetcher = Prefetcher()
+    for idea in ideas[1:]:
+        prefetcher.submit(idea)
+
+    try:
+        for idea in ideas:
+            try:
+                generate_short(idea, lang)
+            except Exception as e:
+                logger.error(f"❌ Short failed for '{idea}': {e}")
+    finally:
+        prefetcher.close()
 
 
 # ---------------- ENTRY ---------------- #
@@ -111,5 +260,6 @@ if __name__ == "__main__":
     if len(sys.argv) < 2:
         raise RuntimeError("Pass idea in quotes")
 
-    lang = sys.argv[2] if len(sys.argv) > 2 else "en"
-    generate_short(sys.argv[1], lang)
+    # "en" or a comma list ("en,hi") for one short per language
+    langs = (sys.argv[2] if len(sys.argv) > 2 else "en").split(",")
+    generate_short(sys.argv[1], langs if len(langs) > 1 else langs[0])
@@ -2,16 +2,76 @@
 import subprocess
 import os
 
+import numpy as np
+
+from src.config.platforms import OutputTarget, PLATFORMS
+from src.utils.audio_utils import SAMPLE_RATE
+from src.utils.resource_governor import cpu_slots, ffmpeg_threads, filter_threads
+
+# Container overhead kept out of a size cap
+SIZE_CAP_HEADROOM = 0.95
+
+
+def _encoder_args(target: OutputTarget, duration: float) -> list[str]:
+    """
+    x264/AAC settings for one platform. Size-capped targets get capped
+    CRF: the maxrate is derived from max_bytes over the clip length.
+    """
+    seconds = min(duration, target.max_seconds)
+
+    args = [
+        "-c:v", "libx264",
+        "-profile:v", "high",
+        "-level", target.level,
+        "-crf", str(target.crf),
+        "-pix_fmt", "yuv420p",
+    ]
+
+    if target.max_bytes:
+        total_kbps = target.max_bytes * 8 * SIZE_CAP_HEADROOM / seconds / 1000
+        video_kbps = int(total_kbps - target.audio_bitrate_k)
+        args += ["-maxrate", f"{video_kbps}k", "-bufsize", f"{video_kbps * 2}k"]
+
+    args += [
+        "-c:a", "aac",
+        "-b:a", f"{target.audio_bitrate_k}k",
+        "-ar", str(target.audio_rate),
+        "-t", f"{seconds:.3f}",
+    ]
+    return args
+
 
 def render_video(
     bg_video: str,
-    audio_file: str,
-    music_file: str,
-    output_file: str,
+    audio_file: str | None,
+    music_file: str | None,
+    output_file: str | None,
     duration: float,
-    subtitles_path: str | None = None
-):
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    subtitles_path: str | None = None,
+    music_gain_db: float | None = None,
+    music_is_stem: bool = False,
+    audio_pcm: np.ndarray | None = None,
+    targets: list[tuple[OutputTarget, str]] | None = None
+) -> list[str]:
+    """
+    music_gain_db: precomputed loudness gain from the music library;
+    without it the legacy fixed 0.20 music volume is used.
+    music_is_stem: music is a canonical library stem (44.1 kHz stereo,
+    ≥ the short's length) — mixed as-is, no loop or resample.
+    audio_pcm: finished mix from src.audio_mix (float32 stereo 44.1 kHz);
+    piped to ffmpeg as the only audio, audio_file/music_file unused.
+    targets: (platform preset, path) pairs rendered in the same run —
+    decode, filters and subtitle burn-in happen once, split per
+    distinct encoder setting, tee'd to every path sharing one.
+    output_file is only the default (YouTube Shorts) when no targets
+    are given. Returns the paths written.
+    """
+    if not targets:
+        if not output_file:
+            raise ValueError("render_video needs output_file or targets")
+        targets = [(PLATFORMS["youtube_shorts"], output_file)]
+    for _, path in targets:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
 
     filters = []
 
@@ -32,66 +92,97 @@ def render_video(
 
     filters.append(f"[0:v]{video_filter}[vout]")
 
-    # ---------------- VOICE FILTER ---------------- #
-    filters.append(
-        "[1:a]"
-        "aformat=sample_fmts=fltp:"
-        "sample_rates=44100:"
-        "channel_layouts=stereo,"
-        "highpass=f=80,"
-        "lowpass=f=12000,"
-        "alimiter=limit=0.97"
-        "[voice]"
-    )
-
-    # ---------------- MUSIC FILTER ---------------- #
-    filters.append(
-        "[2:a]"
-        "aformat=sample_fmts=fltp:"
-        "sample_rates=44100:"
-        "channel_layouts=stereo,"
-        "volume=0.20"
-        "[music]"
-    )
-
-    # ---------------- MIX ---------------- #
-    filters.append("[voice][music]amix=inputs=2:normalize=0[aout]")
-
-    filter_complex = ";".join(filters)
-
-    cmd = [
-        "ffmpeg", "-y",
-
-        # Hard duration cap (Shorts-safe)
-        "-t", str(duration),
-
-        # Background video (looped)
-        "-stream_loop", "-1", "-i", bg_video,
-
-        # Voice
-        "-i", audio_file,
-
-        # Music (looped)
-        "-stream_loop", "-1", "-i", music_file,
-
-        "-filter_complex", filter_complex,
-
-        "-map", "[vout]",
-        "-map", "[aout]",
-
-        # Video encoding (YouTube Shorts safe)
-        "-c:v", "libx264",
-        "-profile:v", "high",
-        "-level", "4.2",
-        "-crf", "18",
-        "-pix_fmt", "yuv420p",
-
-        # Audio encoding
-        "-c:a", "aac",
-        "-b:a", "192k",
-
-        "-shortest",
-        output_file
-    ]
-
-    subprocess.run(cmd, check=True)
+    if audio_pcm is not None:
+        audio_inputs = ["-f", "f32le", "-ar", str(SAMPLE_RATE), "-ac", "2", "-i", "pipe:0"]
+        audio_map = "1:a"
+    else:
+        # ---------------- VOICE FILTER ---------------- #
+        filters.append(
+            "[1:a]"
+            "aformat=sample_fmts=fltp:"
+            "sample_rates=44100:"
+            "channel_layouts=stereo,"
+            "highpass=f=80,"
+            "lowpass=f=12000,"
+            "alimiter=limit=0.97"
+            "[voice]"
+        )
+
+        # ---------------- MUSIC FILTER ---------------- #
+        music_volume = "0.20" if music_gain_db is None else f"{music_gain_db:.2f}dB"
+        if music_is_stem:
+            filters.append(f"[2:a]volume={music_volume}[music]")
+        else:
+            filters.append(
+                "[2:a]"
+                "aformat=sample_fmts=fltp:"
+                "sample_rates=44100:"
+                "channel_layouts=stereo,"
+                f"volume={music_volume}"
+                "[music]"
+            )
+
+        # ---------------- MIX ---------------- #
+        filters.append("[voice][music]amix=inputs=2:normalize=0[aout]")
+
+        audio_inputs = [
+            # Voice
+            "-i", audio_file,
+
+            # Music (raw tracks looped; stems already cover the short)
+            *([] if music_is_stem else ["-stream_loop", "-1"]), "-i", music_file,
+        ]
+        audio_map = "[aout]"
+
+    # ---------------- OUTPUTS (split per encoder, tee per group) ---------------- #
+    groups: dict[tuple, list[str]] = {}
+    for target, path in targets:
+        groups.setdefault(tuple(_encoder_args(target, duration)), []).append(path)
+
+    audio_src = "[1:a]" if audio_pcm is not None else audio_map
+    if len(groups) > 1:
+        n = len(groups)
+        filters.append("[vout]split=" + str(n) + "".join(f"[v{i}]" for i in range(n)))
+        filters.append(f"{audio_src}asplit={n}" + "".join(f"[a{i}]" for i in range(n)))
+        maps = [(f"[v{i}]", f"[a{i}]") for i in range(n)]
+    else:
+        maps = [("[vout]", audio_map)]
+
+    pcm = None
+    if audio_pcm is not None:
+        pcm = np.ascontiguousarray(audio_pcm, dtype=np.float32).tobytes()
+
+    with cpu_slots("render", heavy=True) as threads:
+        # One x264 per group: the grant is shared, not handed to each
+        per_encoder = max(1, threads // len(groups))
+
+        outputs = []
+        for (args, paths), (v, a) in zip(groups.items(), maps):
+            outputs += ["-map", v, "-map", a, *args, *ffmpeg_threads(per_encoder), "-shortest"]
+            if len(paths) == 1:
+                outputs.append(paths[0])
+            else:
+                outputs += ["-f", "tee", "|".join(f"[f=mp4]{p}" for p in paths)]
+
+        filter_complex = ";".join(filters)
+
+        cmd = [
+            "ffmpeg", "-y",
+            *filter_threads(threads),
+
+            # Hard duration cap (Shorts-safe)
+            "-t", str(duration),
+
+            # Background video (looped)
+            "-stream_loop", "-1", "-i", bg_video,
+
+            *audio_inputs,
+
+            "-filter_complex", filter_complex,
+
+            *outputs
+        ]
+
+        subprocess.run(cmd, input=pcm, check=True)
+
+    return [path for _, path in targets]
@@ -1,7 +1,13 @@
 import re
-from src.ollama_llm import generate_short_script
+from src.ollama_llm import (
+    generate_short_script,
+    CALL_SCRIPT,
+    CALL_HOOK,
+    CALL_SENTENCE
+)
 from src.utils.logger import logger
-from yt_analytics.prompt_context import build_prompt_with_insights
+from src.speech_duration import predict_duration
+from yt_analytics.prompt_context import build_prompt_parts, build_insight_block
 
 
 HOOK_KEYWORDS = {
@@ -89,12 +95,13 @@ def generate_multiple_scripts(prompt: str, n=2):
     """Generate fewer scripts to avoid CUDA crashes"""
 
     # 🔹 Analytics-aware prompt enrichment (SAFE)
-    enriched_prompt = build_prompt_with_insights(prompt)
+    # Insights go in the shared prefix so the backend evaluates them once
+    prefix, suffix = build_prompt_parts(prompt)
 
     scripts = []
     for _ in range(n):
         try:
-            s = generate_short_script(enriched_prompt)
+            s = generate_short_script(suffix, call_site=CALL_SCRIPT, prefix=prefix)
             if s:
                 scripts.append(s)
         except Exception as e:
@@ -102,7 +109,11 @@ def generate_multiple_scripts(prompt: str, n=2):
     return scripts
 
 
-def select_best_script(scripts: list):
+def select_best_script(scripts: list, voice: str | None = None, max_seconds: float | None = None):
+    """
+    Picks the best-scoring script.
+    With voice + max_seconds, scripts predicted to overrun are penalized.
+    """
     scored = []
 
     for s in scripts:
@@ -115,7 +126,16 @@ def select_best_script(scripts: list):
         if len(s.split()) < 60:
             continue
 
-        scored.append((score_script(s), s))
+        score = score_script(s)
+
+        if voice and max_seconds:
+            predicted = predict_duration(s, voice)
+            score["predicted_seconds"] = round(predicted, 2)
+            overrun = predicted - max_seconds
+            if overrun > 0:
+                score["total"] = round(score["total"] - overrun * 5, 2)
+
+        scored.append((score, s))
 
     if not scored:
         logger.warning("⚠️ All scripts weak — falling back to best raw script")
@@ -195,7 +215,9 @@ Rules:
 - Return ONLY the hook
 """
 
-            new_hook = generate_short_script(prompt).strip()
+            new_hook = generate_short_script(
+                prompt, call_site=CALL_HOOK, prefix=build_insight_block()
+            ).strip()
 
             if not new_hook or len(new_hook.split()) < 3:
                 continue
@@ -228,7 +250,9 @@ Sentences:
 """ + "\n".join(long_sentences)
 
     try:
-        rewritten = generate_short_script(prompt).splitlines()
+        rewritten = generate_short_script(
+            prompt, call_site=CALL_SENTENCE, prefix=build_insight_block()
+        ).splitlines()
         mapping = dict(zip(long_sentences, rewritten))
     except Exception as e:
         logger.warning(f"⚠️ Sentence rewrite skipped: {e}")
@@ -236,3 +260,28 @@ Sentences:
 
     improved = [mapping.get(s, s) for s in sentences]
     return ". ".join(improved) + "."
+
+# ---------------- DURATION FIT ---------------- #
+
+def fit_to_duration(script: str, voice: str, max_seconds: float) -> str:
+    """
+    Tightens a script until its PREDICTED spoken duration fits.
+    1) Shorter sentence rewrite
+    2) Drop middle sentences (hook + final line are kept)
+    No TTS involved.
+    """
+    predicted = predict_duration(script, voice)
+    if predicted <= max_seconds:
+        return script
+
+    logger.info(f"⏱️ Script predicted {predicted:.1f}s > {max_seconds:.1f}s — tightening")
+
+    script = rewrite_long_sentences(script, max_words=8)
+
+    sentences = split_sentences(script)
+    while len(sentences) > 2 and predict_duration(". ".join(sentences) + ".", voice) > max_seconds:
+        sentences.pop(-2)
+
+    fitted = ". ".join(sentences) + "."
+    logger.info(f"⏱️ Tightened script predicted {predict_duration(fitted, voice):.1f}s")
+    return fitted
@@ -1,11 +1,23 @@
 # src/services/background_service.py
 import os
+import time
 import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 
 from src.bg_fetcher import fetch_background_clips
-from src.video_utils import concat_background_clips
+from src.video_utils import concat_background_clips, probe_video
 from src.utils.fallback_background import create_fallback_background
 from src.utils.logger import logger
+from src.utils import perf
+from src.config.limits import MAX_SHORT_SECONDS
+
+# Extra footage prepared speculatively (render trims it with -t)
+SPECULATIVE_MARGIN = 0.10
+
+# Expected short length before any job has finished on this host
+DEFAULT_EXPECTED_SECONDS = 45.0
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="background")
 
 
 def _expected_clip_count(duration: float) -> int:
@@ -16,6 +28,13 @@ def _expected_clip_count(duration: float) -> int:
     return 5
 
 
+def clip_segment(duration: float) -> float:
+    """
+    Seconds each clip must cover for a background of `duration`.
+    """
+    return duration / _expected_clip_count(duration)
+
+
 def build_background(
     idea: str,
     sentences: list[str],
@@ -32,15 +51,15 @@ def build_background(
 
     try:
         expected = _expected_clip_count(duration)
+        clip_duration = clip_segment(duration)
 
-        clips = fetch_background_clips(idea, expected)
+        clips = fetch_background_clips(idea, expected, min_duration=clip_duration)
         if not clips:
             raise RuntimeError("No background clips fetched")
 
-        clip_duration = duration / expected
         durations = [clip_duration] * expected
 
-        bg_video = concat_background_clips(clips, durations)
+        bg_video = concat_background_clips(clips, durations, output_dir=output_dir)
         return bg_video
 
     except Exception as e:
@@ -57,3 +76,92 @@ def build_background(
         )
 
         return fallback_path
+
+
+# -------------------------------------------------
+# SPECULATIVE START (overlaps script + TTS)
+# -------------------------------------------------
+
+def expected_duration() -> float:
+    """
+    Rolling average length of the shorts finished on this host (the
+    script budget, MAX_SHORT_SECONDS, is only an upper bound).
+    """
+    ewma = perf.load_summary("shorts").get("final", {}).get("ewma", {}).get("seconds")
+    return min(ewma or DEFAULT_EXPECTED_SECONDS, MAX_SHORT_SECONDS)
+
+
+def record_duration(seconds: float):
+    """
+    Folds a finished short's length into expected_duration().
+    """
+    try:
+        perf.update_summary("shorts", "final", {"seconds": seconds})
+    except OSError as e:
+        logger.debug(f"Short duration not recorded: {e}")
+
+
+def speculative_duration(predicted_duration: float | None = None) -> float:
+    """
+    Footage built ahead of the voice: the prediction (default: the
+    rolling average) plus SPECULATIVE_MARGIN.
+    """
+    if predicted_duration is None:
+        predicted_duration = expected_duration()
+    return predicted_duration * (1 + SPECULATIVE_MARGIN)
+
+
+def _footage_seconds(path: str, requested: float) -> float:
+    """
+    Probed length of a built background (clips can run short of their
+    segment); the requested length if it cannot be probed.
+    """
+    try:
+        return probe_video(path)["duration"] or requested
+    except Exception as e:
+        logger.debug(f"Background probe failed for {path}: {e}")
+        return requested
+
+
+def build_speculative(idea: str, duration: float, output_dir: str) -> tuple[str, float]:
+    """
+    build_background for `duration` seconds of footage.
+    Returns (video path, probed seconds of footage).
+    """
+    start = time.time()
+    path = build_background(idea, [], duration, output_dir)
+    built = _footage_seconds(path, duration)
+    logger.info(f"🎬 Speculative background ready ({built:.1f}s in {time.time() - start:.1f}s)")
+    return path, built
+
+
+def start_background(idea: str, predicted_duration: float, output_dir: str) -> Future:
+    """
+    Starts build_speculative in a worker thread from the predicted
+    duration, plus SPECULATIVE_MARGIN, before the voice exists.
+    Future result: (video path, probed seconds of footage).
+    """
+    duration = speculative_duration(predicted_duration)
+    return _executor.submit(build_speculative, idea, duration, output_dir)
+
+
+def finish_background(
+    future: Future,
+    idea: str,
+    sentences: list[str],
+    duration: float,
+    output_dir: str
+) -> str:
+    """
+    Speculative background if it covers `duration` (render trims the
+    rest), otherwise a regular build now.
+    """
+    try:
+        path, built = future.result()
+        if built >= duration:
+            return path
+        logger.warning(f"🎬 Speculative background too short ({built:.1f}s < {duration:.1f}s), rebuilding")
+    except Exception as e:
+        logger.warning(f"🎬 Speculative background failed: {e}")
+
+    return build_background(idea, sentences, duration, output_dir)
@@ -3,8 +3,10 @@ import re
 import os
 
 from src.tts_edge import text_to_speech
-from src.text_utils import sanitize_for_tts
-from src.utils.audio_utils import get_audio_duration
+from src.text_utils import sanitize_for_tts, pad_for_tts
+from src.utils.audio_buffer import AudioBuffer
+from src.speech_duration import predict_duration, observe
+from src.config.limits import MAX_SHORT_SECONDS
 
 
 CTA_FALLBACK_POOL = [
@@ -14,6 +16,26 @@ CTA_FALLBACK_POOL = [
     "Follow for daily facts!",
 ]
 
+# The CTA is read by the body voice, so it must be in the body's language
+CTA_POOLS = {
+    "en": CTA_FALLBACK_POOL,
+    "hi": [
+        "और वीडियो के लिए फॉलो करें!",
+        "ऐसे ही शॉर्ट्स के लिए सब्सक्राइब करें!",
+        "लाइक करें और फॉलो करें!",
+        "रोज़ नए तथ्यों के लिए फॉलो करें!",
+    ],
+}
+
+
+def cta_pool(lang: str) -> list[str]:
+    return CTA_POOLS.get(lang, CTA_FALLBACK_POOL)
+
+
+def _spoken(cta: str) -> str:
+    # What Edge-TTS actually reads (short CTAs get padded)
+    return pad_for_tts(sanitize_for_tts(cta))
+
 
 def is_tts_safe(text: str) -> bool:
     if not text or len(text.split()) < 3:
@@ -23,14 +45,38 @@ def is_tts_safe(text: str) -> bool:
     return True
 
 
-def generate_cta(idea: str, body_duration: float):
-    fallback = random.choice(CTA_FALLBACK_POOL)
+def cta_reserve(voice: str, lang: str = "en") -> float:
+    """
+    Predicted seconds to keep free for the CTA (longest option).
+    """
+    return max(predict_duration(_spoken(c), voice) for c in cta_pool(lang))
+
+
+def generate_cta(idea: str, body_duration: float, voice: str | None = None, lang: str = "en"):
+    options = cta_pool(lang).copy()
+    random.shuffle(options)
+
+    if voice:
+        # Only synthesize a CTA that is predicted to fit
+        remaining = MAX_SHORT_SECONDS - body_duration
+        options = [
+            c for c in options
+            if predict_duration(_spoken(c), voice) <= remaining
+        ]
+        if not options:
+            return None, None, 0.0
+
+    fallback = options[0]
 
     try:
-        audio = text_to_speech(sanitize_for_tts(fallback))
-        duration = get_audio_duration(audio)
+        text = sanitize_for_tts(fallback)
+        audio = text_to_speech(text, voice=voice)
+        duration = AudioBuffer.from_file(audio).duration
+
+        if voice:
+            observe(pad_for_tts(text), voice, duration)
 
-        if body_duration + duration <= 59:
+        if body_duration + duration <= MAX_SHORT_SECONDS:
             return fallback, audio, duration
 
     except Exception:
@@ -0,0 +1,149 @@
+# src/services/prefetch_service.py
+import queue
+import shutil
+import threading
+import time
+
+from src.bg_fetcher import prefetch_background_clips
+from src.bg_music_fetcher import prefetch_music
+from src.services.background_service import clip_segment, speculative_duration
+from src.utils import perf
+from src.utils.downloads import metered, DownloadIncomplete
+from src.utils.logger import logger
+
+# Clips downloaded ahead per queued idea (a job uses 3–5)
+CLIPS_PER_IDEA = 6
+
+
+# Total bytes one Prefetcher may add to the caches
+BYTE_BUDGET = 1536 * 1024 * 1024
+
+# Average download rate, so prefetch never starves the running job
+BANDWIDTH_BYTES_PER_SEC = 4 * 1024 * 1024
+
+# Stop prefetching when the disk gets this full
+MIN_FREE_BYTES = 5 * 1024 * 1024 * 1024
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def consume(self, amount: float, stop: threading.Event):
+        """
+        Blocks until the debt from `amount` bytes has been paid back.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+
+        if self.tokens < 0:
+            stop.wait(-self.tokens / self.rate)
+
+
+class Prefetcher:
+    """
+    Background worker that warms the stock/music search caches and
+    downloads candidate clips + a music track for ideas that are
+    queued but not yet running, within a byte and bandwidth budget.
+
+    The jobs' own background/music stages then serve these from the
+    local clip index and music cache.
+    """
+
+    def __init__(
+        self,
+        byte_budget: int = BYTE_BUDGET,
+        bandwidth: float = BANDWIDTH_BYTES_PER_SEC,
+        cache_dir: str = "assets"
+    ):
+        self.byte_budget = byte_budget
+        self.cache_dir = cache_dir
+        self.used_bytes = 0
+
+        self._bucket = _TokenBucket(bandwidth, burst=bandwidth)
+        self._queue: queue.Queue = queue.Queue()
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="prefetch", daemon=True)
+        self._worker.start()
+
+    # ---------------- PUBLIC ---------------- #
+
+    def submit(self, idea: str):
+        self._queue.put(idea)
+
+    def close(self, wait: bool = False):
+        """
+        Stops mid-download (the .part resumes later) or, with wait,
+        after the queue drains.
+        """
+        if wait:
+            self._queue.join()
+        self._stop.set()
+        self._queue.put(None)
+        self._worker.join(timeout=5)
+
+    # ---------------- WORKER ---------------- #
+
+    def _budget_left(self) -> bool:
+        if self._stop.is_set() or self.used_bytes >= self.byte_budget:
+            return False
+        try:
+            return shutil.disk_usage(self.cache_dir).free >= MIN_FREE_BYTES
+        except OSError:
+            return True
+
+    def _spend(self, nbytes: int):
+        """
+        Charged per downloaded chunk, so the rate holds within a file.
+        """
+        if self._stop.is_set() or self.used_bytes >= self.byte_budget:
+            raise DownloadIncomplete("prefetch stopped")
+
+        self.used_bytes += nbytes
+        perf.incr("prefetch", "bytes", downloaded=nbytes)
+        self._bucket.consume(nbytes, self._stop)
+
+    def _prefetch(self, idea: str):
+        start = time.time()
+        clips = 0
+        music = None
+
+        # Same segment a job's speculative background will ask of each clip
+        segment = clip_segment(speculative_duration())
+
+        try:
+            with metered(self._spend):
+                for _ in prefetch_background_clips(idea, CLIPS_PER_IDEA, segment):
+                    clips += 1
+                    if not self._budget_left():
+                        break
+
+                if self._budget_left():
+                    music = prefetch_music(idea)
+        except DownloadIncomplete as e:
+            logger.debug(f"📦 Prefetch cut short: {e}")
+
+        perf.incr("prefetch", "ideas", count=1, clips=clips, music=1 if music else 0)
+        logger.info(
+            f"📦 Prefetched '{idea[:40]}': {clips} clips, "
+            f"music {'ready' if music else 'missing'} "
+            f"({time.time() - start:.1f}s, {self.used_bytes / 1024 / 1024:.0f} MB used)"
+        )
+
+    def _run(self):
+        while True:
+            idea = self._queue.get()
+            try:
+                if idea is None:
+                    return
+                if self._budget_left():
+                    self._prefetch(idea)
+            except Exception as e:
+                logger.warning(f"📦 Prefetch failed for '{idea}': {e}")
+            finally:
+                self._queue.task_done()
@@ -3,19 +3,35 @@ from src.script_quality import (
     generate_multiple_scripts,
     select_best_script,
     regenerate_hook,
-    rewrite_long_sentences
+    rewrite_long_sentences,
+    fit_to_duration
 )
 from src.text_utils import clean_llm_script, sanitize_spoken_script
 from src.config.comment_bait import COMMENT_BAIT
+from src.speech_duration import predict_duration
 
 import random
 
 
-def generate_script(idea: str, lang: str) -> str:
+def generate_script(
+    idea: str,
+    lang: str,
+    voice: str | None = None,
+    max_seconds: float | None = None
+) -> str:
+    """
+    With voice + max_seconds, the script is selected and tightened
+    against the predicted spoken duration (comment bait included).
+    """
     prompt = SCRIPT_BODY_PROMPTS[lang].format(idea=idea)
 
+    bait = random.choice(COMMENT_BAIT.get(lang, COMMENT_BAIT["en"]))
+    body_budget = None
+    if voice and max_seconds:
+        body_budget = max_seconds - predict_duration(bait, voice)
+
     scripts = generate_multiple_scripts(prompt, n=2)
-    script = select_best_script(scripts)
+    script = select_best_script(scripts, voice=voice, max_seconds=body_budget)
 
     script = regenerate_hook(script, idea)
     script = rewrite_long_sentences(script)
@@ -23,8 +39,10 @@ def generate_script(idea: str, lang: str) -> str:
     cleaned = sanitize_spoken_script(clean_llm_script(script))
     final_script = cleaned if cleaned.strip() else script
 
+    if body_budget:
+        final_script = fit_to_duration(final_script, voice, body_budget)
+
     # ---------------- COMMENT-BAIT INJECTION ---------------- #
-    bait = random.choice(COMMENT_BAIT.get(lang, COMMENT_BAIT["en"]))
     final_script = final_script.rstrip(". ") + ". " + bait
 
     return final_script
@@ -0,0 +1,172 @@
+# src/speech_duration.py
+import json
+import os
+import re
+import threading
+
+from filelock import FileLock
+
+# -------------------------------------------------
+# CONFIG
+# -------------------------------------------------
+
+# Per-voice sufficient statistics (a few numbers per voice)
+MODEL_PATH = "assets/speech_rates.json"
+LOCK_PATH = "assets/locks/speech_rates.lock"
+
+# How long an observation waits for another process's write
+LOCK_TIMEOUT_SEC = 10
+
+# Prior strength, in pseudo-observations, toward the default rates
+PRIOR_WEIGHT = 3.0
+
+# Default model: seconds = intercept + per_word * words + per_pause * pauses
+DEFAULT_COEFFS = {
+    "en": [0.3, 0.38, 0.35],
+    "hi": [0.3, 0.42, 0.35],
+}
+
+_lock = threading.Lock()
+_models: dict | None = None
+
+
+# -------------------------------------------------
+# FEATURES
+# -------------------------------------------------
+
+def _features(text: str) -> list[float]:
+    words = len(text.split())
+    pauses = len(re.findall(r"[.!?,;:।]", text))
+    return [1.0, float(words), float(pauses)]
+
+
+def _voice_lang(voice: str) -> str:
+    return "hi" if voice.lower().startswith("hi-") else "en"
+
+
+# -------------------------------------------------
+# STORAGE
+# -------------------------------------------------
+
+def _read() -> dict:
+    try:
+        with open(MODEL_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _load() -> dict:
+    global _models
+    if _models is None:
+        _models = _read()
+    return _models
+
+
+def _save(models: dict):
+    os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
+    tmp = f"{MODEL_PATH}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(models, f)
+    os.replace(tmp, MODEL_PATH)
+
+
+def _empty_stats(voice: str) -> dict:
+    """
+    Ridge prior: PRIOR_WEIGHT pseudo-observations of the default rates.
+    """
+    prior = DEFAULT_COEFFS[_voice_lang(voice)]
+    return {
+        "n": 0,
+        "xtx": [[PRIOR_WEIGHT if i == j else 0.0 for j in range(3)] for i in range(3)],
+        "xty": [PRIOR_WEIGHT * c for c in prior],
+    }
+
+
+# -------------------------------------------------
+# FIT
+# -------------------------------------------------
+
+def _solve(a: list[list[float]], b: list[float]) -> list[float]:
+    """
+    3x3 Gaussian elimination with partial pivoting.
+    """
+    n = len(b)
+    m = [row[:] + [b[i]] for i, row in enumerate(a)]
+
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(m[r][col]))
+        m[col], m[pivot] = m[pivot], m[col]
+
+        if abs(m[col][col]) < 1e-12:
+            raise ValueError("singular system")
+
+        for r in range(col + 1, n):
+            factor = m[r][col] / m[col][col]
+            for c in range(col, n + 1):
+                m[r][c] -= factor * m[col][c]
+
+    x = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        x[r] = (m[r][n] - sum(m[r][c] * x[c] for c in range(r + 1, n))) / m[r][r]
+    return x
+
+
+def _coeffs(voice: str) -> list[float]:
+    stats = _load().get(voice)
+    if not stats:
+        return DEFAULT_COEFFS[_voice_lang(voice)]
+    try:
+        return _solve(stats["xtx"], stats["xty"])
+    except ValueError:
+        return DEFAULT_COEFFS[_voice_lang(voice)]
+
+
+# -------------------------------------------------
+# PUBLIC API
+# -------------------------------------------------
+
+def predict_duration(text: str, voice: str) -> float:
+    """
+    Predicted spoken duration (seconds) of text for a TTS voice.
+    No TTS call needed.
+    """
+    if not text or not text.strip():
+        return 0.0
+
+    with _lock:
+        coeffs = _coeffs(voice)
+
+    x = _features(text)
+    return max(0.0, sum(c * v for c, v in zip(coeffs, x)))
+
+
+def observe(text: str, voice: str, duration: float):
+    """
+    Folds one observed (text, duration) pair into the voice's model.
+    Serialized across processes (file lock); dropped on a lock timeout.
+    """
+    if not text or not text.strip() or duration <= 0:
+        return
+
+    global _models
+    x = _features(text)
+
+    with _lock:
+        try:
+            os.makedirs(os.path.dirname(LOCK_PATH), exist_ok=True)
+            # Other pipelines write too: re-read under the lock, fold, write
+            with FileLock(LOCK_PATH, timeout=LOCK_TIMEOUT_SEC):
+                models = _read()
+                stats = models.setdefault(voice, _empty_stats(voice))
+
+                for i in range(3):
+                    stats["xty"][i] += x[i] * duration
+                    for j in range(3):
+                        stats["xtx"][i][j] += x[i] * x[j]
+                stats["n"] += 1
+
+                _save(models)
+                _models = models
+        except OSError:
+            pass
@@ -21,6 +21,21 @@ def sanitize_for_tts(text: str) -> str:
     return text.strip()
 
 
+# Edge-TTS hard-fails on tiny input; shorter text is padded
+MIN_TTS_WORDS = 4
+
+
+def pad_for_tts(text: str) -> str:
+    """
+    The exact text Edge-TTS is given for short input (duration
+    prediction must see the same string).
+    """
+    text = text.strip()
+    if len(text.split()) < MIN_TTS_WORDS:
+        return f"{text}. Stay tuned."
+    return text
+
+
 # ---------------- LLM CLEANUP ---------------- #
 
 def clean_llm_script(text: str) -> str:
@@ -8,6 +8,8 @@ import random
 import time
 from typing import Optional
 
+from src.text_utils import pad_for_tts
+
 # ---------------- CONFIG ---------------- #
 
 RATE = "+0%"
@@ -107,11 +109,8 @@ def text_to_speech(
     - Final semantic simplification fallback
     """
 
-    text = text.strip()
-
     # 🔒 Edge hard-fails on tiny input
-    if len(text.split()) < 4:
-        text = f"{text}. Stay tuned."
+    text = pad_for_tts(text)
 
     text = (
         text.replace("—", " ")
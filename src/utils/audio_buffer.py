@@ -0,0 +1,165 @@
+# src/utils/audio_buffer.py
+"""
+Decode-once audio shared by every stage of a job.
+
+AudioBuffer.from_file() runs ffmpeg once per file into a memory-mapped
+float32 array; later calls for the same (unchanged) file get the same
+buffer. Duration, the 16 kHz mono view Whisper wants and the frame
+RMS the mixer ducks with are derived from it in-process, without
+ffprobe or re-decoding.
+"""
+import atexit
+import os
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from src.utils.audio_utils import SAMPLE_RATE
+
+WHISPER_RATE = 16000
+
+# Decoded buffers kept per process (voice body, CTA, music…)
+MAX_BUFFERS = 16
+
+_registry: "OrderedDict[tuple, AudioBuffer]" = OrderedDict()
+_registry_lock = threading.Lock()
+_leftovers: list[str] = []
+
+
+@atexit.register
+def _cleanup():
+    for path in _leftovers:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _decode_to_memmap(path: str, sample_rate: int, channels: int) -> np.ndarray:
+    fd, raw = tempfile.mkstemp(prefix="pcm_", suffix=".f32")
+    os.close(fd)
+
+    try:
+        subprocess.run(
+            [
+                "ffmpeg", "-y", "-v", "error", "-err_detect", "ignore_err",
+                "-i", path,
+                "-f", "f32le", "-ac", str(channels), "-ar", str(sample_rate),
+                raw
+            ],
+            check=True
+        )
+
+        if os.path.getsize(raw) < 4 * channels:
+            raise RuntimeError(f"Could not decode audio: {path}")
+
+        samples = np.memmap(raw, dtype=np.float32, mode="r").reshape(-1, channels)
+    except Exception:
+        os.remove(raw)
+        raise
+
+    # POSIX keeps the mapping alive after unlink; Windows cleans up at exit
+    try:
+        os.remove(raw)
+    except OSError:
+        _leftovers.append(raw)
+
+    return samples
+
+
+class AudioBuffer:
+    """
+    Float32 samples (frames, channels) at sample_rate, read-only.
+    """
+
+    def __init__(self, samples: np.ndarray, sample_rate: int = SAMPLE_RATE, source: str | None = None):
+        if samples.ndim == 1:
+            samples = samples[:, None]
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.source = source
+        self._derived: dict = {}
+
+    # ---------------- CONSTRUCTION ---------------- #
+
+    @classmethod
+    def from_file(cls, path: str, sample_rate: int = SAMPLE_RATE, channels: int = 1) -> "AudioBuffer":
+        st = os.stat(path)
+        key = (os.path.abspath(path), st.st_mtime_ns, st.st_size, sample_rate, channels)
+
+        with _registry_lock:
+            buf = _registry.get(key)
+            if buf is not None:
+                _registry.move_to_end(key)
+                return buf
+
+        buf = cls(_decode_to_memmap(path, sample_rate, channels), sample_rate, source=path)
+
+        with _registry_lock:
+            _registry[key] = buf
+            while len(_registry) > MAX_BUFFERS:
+                _registry.popitem(last=False)
+
+        return buf
+
+    @classmethod
+    def concat(cls, buffers: list["AudioBuffer | None"]) -> "AudioBuffer":
+        """
+        Joins buffers (None skipped) in memory. Same rate/channels required.
+        """
+        parts = [b for b in buffers if b is not None]
+        if not parts:
+            return cls(np.zeros((0, 1), dtype=np.float32))
+
+        rates = {b.sample_rate for b in parts}
+        if len(rates) != 1:
+            raise ValueError("AudioBuffer.concat needs a single sample rate")
+
+        return cls(np.concatenate([b.samples for b in parts]), parts[0].sample_rate)
+
+    # ---------------- VIEWS ---------------- #
+
+    @property
+    def frames(self) -> int:
+        return len(self.samples)
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate
+
+    def mono(self) -> np.ndarray:
+        if self.samples.shape[1] == 1:
+            return np.asarray(self.samples[:, 0])
+        return self.samples.mean(axis=1)
+
+    def mono_16k(self) -> np.ndarray:
+        """
+        16 kHz mono float32 (what Whisper transcribes), FFT-resampled once.
+        """
+        if "mono_16k" not in self._derived:
+            x = self.mono().astype(np.float32)
+            if self.sample_rate == WHISPER_RATE or len(x) == 0:
+                y = x
+            else:
+                n_out = int(round(len(x) * WHISPER_RATE / self.sample_rate))
+                spectrum = np.fft.rfft(x)[: n_out // 2 + 1]
+                y = np.fft.irfft(spectrum, n=n_out) * (n_out / len(x))
+            self._derived["mono_16k"] = np.ascontiguousarray(y, dtype=np.float32)
+        return self._derived["mono_16k"]
+
+    # ---------------- LEVELS ---------------- #
+
+    def frame_rms(self, frame_sec: float) -> np.ndarray:
+        """
+        RMS per consecutive frame_sec window (mono), cached.
+        """
+        key = ("rms", frame_sec)
+        if key not in self._derived:
+            frame = max(1, int(frame_sec * self.sample_rate))
+            x = self.mono()
+            x = np.pad(x, (0, (-len(x)) % frame)).reshape(-1, frame)
+            self._derived[key] = np.sqrt(np.mean(x ** 2, axis=1))
+        return self._derived[key]
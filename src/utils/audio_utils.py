@@ -1,6 +1,8 @@
 import subprocess
 import json
 
+import numpy as np
+
 
 def get_audio_duration(path: str) -> float:
     cmd = [
@@ -13,3 +15,56 @@ def get_audio_duration(path: str) -> float:
     result = subprocess.run(cmd, capture_output=True, text=True)
     data = json.loads(result.stdout)
     return float(data["streams"][0]["duration"])
+
+
+# ---------------- PCM (NumPy) ---------------- #
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+
+
+def decode_pcm(
+    path: str,
+    sample_rate: int = SAMPLE_RATE,
+    channels: int = CHANNELS,
+    max_seconds: float | None = None
+):
+    """
+    Decodes any audio file to float32 samples, shape (frames, channels).
+    Corrupt tails (truncated MP3s) are skipped, not fatal.
+    """
+    cmd = ["ffmpeg", "-v", "error", "-err_detect", "ignore_err", "-i", path]
+    if max_seconds:
+        cmd += ["-t", f"{max_seconds:.3f}"]
+    cmd += ["-f", "f32le", "-ac", str(channels), "-ar", str(sample_rate), "-"]
+
+    result = subprocess.run(cmd, capture_output=True)
+    if not result.stdout:
+        raise RuntimeError(f"Could not decode audio: {path}")
+
+    samples = np.frombuffer(result.stdout, dtype=np.float32)
+    return samples[: len(samples) // channels * channels].reshape(-1, channels)
+
+
+def encode_pcm(
+    samples,
+    out: str,
+    sample_rate: int = SAMPLE_RATE,
+    codec_args: list[str] | None = None
+):
+    """
+    Encodes float32 (frames, channels) samples to out via ffmpeg stdin.
+    """
+    data = np.ascontiguousarray(samples, dtype=np.float32)
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-v", "error",
+            "-f", "f32le", "-ar", str(sample_rate), "-ac", str(data.shape[1]),
+            "-i", "pipe:0",
+            *(codec_args or []),
+            out
+        ],
+        input=data.tobytes(),
+        check=True
+    )
+
@@ -0,0 +1,464 @@
+# src/utils/cache_manager.py
+"""
+Size-bounded media caches.
+
+Tracks every cached artifact (size, last access, hits) in one SQLite
+table, enforces a byte budget per cache with LRU or LFU eviction, and
+never evicts files leased by a running job.
+
+CLI:
+    python -m src.utils.cache_manager stats
+    python -m src.utils.cache_manager evict [--dry-run]
+"""
+import fnmatch
+import json
+import os
+import shutil
+import sys
+import time
+
+from src.utils.db import connect
+from src.utils.logger import logger
+
+DB_PATH = "assets/cache_manager.db"
+
+MB = 1024 * 1024
+
+# name -> root, file patterns (top level of root), byte budget, policy.
+# "dirs": each sub-directory is one artifact (job outputs).
+CACHES = {
+    "bg_cache": {
+        "root": "assets/bg_cache",
+        "patterns": ["pexels_*.mp4", "pixabay_*.mp4", "pexels_*.mp4.part", "pixabay_*.mp4.part"],
+        "budget": 4096 * MB,
+        "policy": "lfu",
+    },
+    "music_cache": {
+        "root": "assets/music_cache",
+        "patterns": ["*.mp3", "*.mp3.part"],
+        "budget": 512 * MB,
+        "policy": "lru",
+    },
+    "music_stems": {
+        "root": "assets/music_cache/stems",
+        "patterns": ["*.m4a"],
+        "budget": 256 * MB,
+        "policy": "lru",
+    },
+    "tts": {
+        "root": "assets",
+        "patterns": ["tmp_*.wav", "voice_*.wav", "tts_list_*.txt"],
+        "budget": 256 * MB,
+        "policy": "lru",
+    },
+    "outputs": {
+        "root": "outputs",
+        "dirs": True,
+        "budget": 20 * 1024 * MB,
+        "policy": "lru",
+    },
+}
+
+# Files removed together with their artifact
+COMPANION_SUFFIXES = [".window.json"]
+
+# Fresh files may still be written by a job that has not leased them yet
+MIN_AGE_SEC = 15 * 60
+
+# Unfinished downloads (.part, kept for resume) are dropped after this
+# even when the cache is under budget
+PART_TTL_SEC = 24 * 3600
+
+# Leases of live processes older than this are considered leaked
+LEASE_TTL_SEC = 6 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    path TEXT PRIMARY KEY,
+    cache TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_cache ON artifacts(cache, last_access);
+CREATE TABLE IF NOT EXISTS counters (
+    cache TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    evicted INTEGER NOT NULL DEFAULT 0,
+    evicted_bytes INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS leases (
+    path TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    acquired_at REAL NOT NULL,
+    PRIMARY KEY (path, pid)
+);
+"""
+
+
+def _db():
+    conn = connect(DB_PATH)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _norm(path: str) -> str:
+    return os.path.normpath(os.path.abspath(path))
+
+
+def cache_for(path: str) -> str | None:
+    """
+    Name of the cache an artifact path belongs to, if any.
+    """
+    path = _norm(path)
+    for name, cfg in CACHES.items():
+        root = _norm(cfg["root"])
+        if os.path.dirname(path) != root:
+            continue
+        if cfg.get("dirs"):
+            return name
+        if any(fnmatch.fnmatch(os.path.basename(path), p) for p in cfg["patterns"]):
+            return name
+    return None
+
+
+def disk_size(path: str) -> int:
+    if os.path.isdir(path):
+        total = 0
+        for dirpath, _, files in os.walk(path):
+            for f in files:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, f))
+                except OSError:
+                    pass
+        return total
+
+    # Sparse (partial) clips: count blocks actually on disk
+    st = os.stat(path)
+    blocks = getattr(st, "st_blocks", None)
+    return min(st.st_size, blocks * 512) if blocks is not None else st.st_size
+
+
+# -------------------------------------------------
+# ACCESS TRACKING
+# -------------------------------------------------
+
+def _record(path: str, hit: bool):
+    name = cache_for(path)
+    if name is None or not os.path.exists(path):
+        return
+
+    conn = _db()
+    now = time.time()
+    key = _norm(path)
+
+    with conn:
+        conn.execute(
+            "INSERT INTO artifacts (path, cache, size, last_access, hits) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET size = excluded.size, "
+            "last_access = excluded.last_access, hits = hits + excluded.hits",
+            (key, name, disk_size(key), now, 1 if hit else 0),
+        )
+        conn.execute("INSERT OR IGNORE INTO counters (cache) VALUES (?)", (name,))
+        column = "hits" if hit else "misses"
+        conn.execute(f"UPDATE counters SET {column} = {column} + 1 WHERE cache = ?", (name,))
+
+
+def touch(path: str):
+    """
+    Records a cache hit (served without downloading/regenerating).
+    Never raises — bookkeeping must not break a render.
+    """
+    try:
+        _record(path, hit=True)
+    except Exception as e:
+        logger.debug(f"Cache touch failed: {e}")
+
+
+def register(path: str):
+    """
+    Records a newly created artifact (a cache miss).
+    """
+    try:
+        _record(path, hit=False)
+    except Exception as e:
+        logger.debug(f"Cache register failed: {e}")
+
+
+# -------------------------------------------------
+# LEASES (files in use by running jobs)
+# -------------------------------------------------
+
+def lease(*paths: str):
+    """
+    Protects paths from eviction until release_leases() or process exit.
+    """
+    try:
+        conn = _db()
+        now = time.time()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO leases (path, pid, acquired_at) VALUES (?, ?, ?)",
+                [(_norm(p), os.getpid(), now) for p in paths if p],
+            )
+    except Exception as e:
+        logger.debug(f"Cache lease failed: {e}")
+
+
+def release_leases():
+    try:
+        conn = _db()
+        with conn:
+            conn.execute("DELETE FROM leases WHERE pid = ?", (os.getpid(),))
+    except Exception as e:
+        logger.debug(f"Cache lease release failed: {e}")
+
+
+def _pid_alive_windows(pid: int) -> bool:
+    try:
+        import psutil
+        return psutil.pid_exists(pid)
+    except ImportError:
+        pass
+
+    import ctypes
+    from ctypes import wintypes
+
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    STILL_ACTIVE = 259
+    ERROR_ACCESS_DENIED = 5
+
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        # Exists but owned by someone else
+        return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+
+    try:
+        code = wintypes.DWORD()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+            return True
+        return code.value == STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def _pid_alive(pid: int) -> bool:
+    # On Windows os.kill(pid, 0) is TerminateProcess, not a probe
+    if os.name == "nt":
+        return _pid_alive_windows(pid)
+
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # exists, owned by someone else
+
+
+def _leased(conn) -> set[str]:
+    now = time.time()
+    live, dead = set(), []
+
+    for row in conn.execute("SELECT path, pid, acquired_at FROM leases"):
+        if now - row["acquired_at"] < LEASE_TTL_SEC and _pid_alive(row["pid"]):
+            live.add(row["path"])
+        else:
+            dead.append((row["path"], row["pid"]))
+
+    if dead:
+        with conn:
+            conn.executemany("DELETE FROM leases WHERE path = ? AND pid = ?", dead)
+
+    return live
+
+
+# -------------------------------------------------
+# SCAN + EVICTION
+# -------------------------------------------------
+
+def _artifacts_on_disk(name: str) -> list[str]:
+    cfg = CACHES[name]
+    root = cfg["root"]
+    if not os.path.isdir(root):
+        return []
+
+    out = []
+    for entry in os.listdir(root):
+        path = os.path.join(root, entry)
+        if cfg.get("dirs"):
+            if os.path.isdir(path):
+                out.append(_norm(path))
+        elif os.path.isfile(path) and any(fnmatch.fnmatch(entry, p) for p in cfg["patterns"]):
+            out.append(_norm(path))
+    return out
+
+
+def scan(name: str):
+    """
+    Syncs the table with the directory: adopts untracked files
+    (last access = mtime), drops rows of files deleted elsewhere.
+    """
+    conn = _db()
+    on_disk = set(_artifacts_on_disk(name))
+    known = {
+        r["path"]: r["size"]
+        for r in conn.execute("SELECT path, size FROM artifacts WHERE cache = ?", (name,))
+    }
+
+    with conn:
+        for path in on_disk - known.keys():
+            try:
+                conn.execute(
+                    "INSERT OR IGNORE INTO artifacts (path, cache, size, last_access, hits) "
+                    "VALUES (?, ?, ?, ?, 0)",
+                    (path, name, disk_size(path), os.path.getmtime(path)),
+                )
+            except OSError:
+                pass
+
+        # Directories keep growing while a job writes into them
+        if CACHES[name].get("dirs"):
+            for path in on_disk & known.keys():
+                conn.execute(
+                    "UPDATE artifacts SET size = ? WHERE path = ?", (disk_size(path), path)
+                )
+
+        conn.executemany(
+            "DELETE FROM artifacts WHERE path = ?",
+            [(p,) for p in known.keys() - on_disk],
+        )
+
+
+def _remove(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        os.remove(path)
+
+    for suffix in COMPANION_SUFFIXES:
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def _candidates(conn, name: str) -> list:
+    order = (
+        "hits ASC, last_access ASC"
+        if CACHES[name]["policy"] == "lfu"
+        else "last_access ASC"
+    )
+    return conn.execute(
+        f"SELECT path, size, last_access, hits FROM artifacts WHERE cache = ? ORDER BY {order}",
+        (name,),
+    ).fetchall()
+
+
+def evict(name: str | None = None, dry_run: bool = False) -> dict:
+    """
+    Brings each cache (or just `name`) under its budget.
+    Returns {cache: {"files": n, "bytes": freed}}.
+    """
+    conn = _db()
+    leased = _leased(conn)
+    now = time.time()
+    report = {}
+
+    for cache in [name] if name else CACHES:
+        scan(cache)
+        rows = _candidates(conn, cache)
+        total = sum(r["size"] for r in rows)
+        over = total - CACHES[cache]["budget"]
+        freed, files = 0, 0
+
+        for row in rows:
+            path = row["path"]
+            if path in leased:
+                continue
+
+            try:
+                age = now - os.path.getmtime(path)
+                # Abandoned resumes go regardless of the budget
+                expired = path.endswith(".part") and age > PART_TTL_SEC
+                if freed >= over and not expired:
+                    continue
+                if age < MIN_AGE_SEC:
+                    continue
+                if not dry_run:
+                    _remove(path)
+            except OSError as e:
+                logger.debug(f"Evict failed for {path}: {e}")
+                continue
+
+            freed += row["size"]
+            files += 1
+
+            if not dry_run:
+                with conn:
+                    conn.execute("DELETE FROM artifacts WHERE path = ?", (path,))
+                    conn.execute("INSERT OR IGNORE INTO counters (cache) VALUES (?)", (cache,))
+                    conn.execute(
+                        "UPDATE counters SET evicted = evicted + 1, "
+                        "evicted_bytes = evicted_bytes + ? WHERE cache = ?",
+                        (row["size"], cache),
+                    )
+
+        if files:
+            verb = "Would evict" if dry_run else "Evicted"
+            logger.info(f"🧹 {verb} {files} from {cache} ({freed / MB:.1f} MB)")
+
+        report[cache] = {"files": files, "bytes": freed}
+
+    return report
+
+
+# -------------------------------------------------
+# STATS
+# -------------------------------------------------
+
+def stats() -> dict:
+    """
+    Per cache: size vs budget, hit rate, reclaimable bytes.
+    """
+    conn = _db()
+    leased = _leased(conn)
+    out = {}
+
+    for name, cfg in CACHES.items():
+        scan(name)
+        rows = _candidates(conn, name)
+        counters = conn.execute(
+            "SELECT hits, misses, evicted, evicted_bytes FROM counters WHERE cache = ?", (name,)
+        ).fetchone()
+        hits, misses, evicted, evicted_bytes = tuple(counters) if counters else (0, 0, 0, 0)
+
+        total = sum(r["size"] for r in rows)
+        unleased = sum(r["size"] for r in rows if r["path"] not in leased)
+
+        out[name] = {
+            "files": len(rows),
+            "mb": round(total / MB, 1),
+            "budget_mb": round(cfg["budget"] / MB, 1),
+            "policy": cfg["policy"],
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+            "over_budget_mb": round(max(0, total - cfg["budget"]) / MB, 1),
+            "reclaimable_mb": round(unleased / MB, 1),
+            "leased": sum(1 for r in rows if r["path"] in leased),
+            "evicted": evicted,
+            "evicted_mb": round(evicted_bytes / MB, 1),
+        }
+
+    return out
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "stats"
+
+    if cmd == "evict":
+        result = evict(dry_run="--dry-run" in sys.argv)
+        print(json.dumps(result, indent=2))
+    else:
+        print(json.dumps(stats(), indent=2))
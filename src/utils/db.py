@@ -0,0 +1,28 @@
+# src/utils/db.py
+import os
+import sqlite3
+import threading
+
+_local = threading.local()
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """
+    Per-thread SQLite connection in WAL mode.
+    Safe for concurrent readers + a writer across jobs/processes.
+    """
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+
+    conn = conns.get(path)
+    if conn is None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=10000")
+        conns[path] = conn
+
+    return conn
@@ -0,0 +1,179 @@
+# src/utils/downloads.py
+"""
+Crash-safe media downloads for the asset caches.
+
+- Written to <dest>.part, renamed into place only after validation,
+  so a cache path that exists is always a complete file
+- Interrupted downloads resume from the .part via HTTP Range
+- One download per destination across threads and processes
+  (file lock under assets/locks/downloads)
+- Every chunk can be charged to a per-thread meter (prefetch bandwidth)
+"""
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+from filelock import FileLock
+
+from src.utils import http_client
+
+LOCK_DIR = "assets/locks/downloads"
+
+# How long to wait for another job downloading the same file
+LOCK_TIMEOUT_SEC = 300
+
+CHUNK_SIZE = 1024 * 1024
+
+_locks: dict[str, FileLock] = {}
+_locks_guard = threading.Lock()
+
+_meter = threading.local()
+
+
+class DownloadIncomplete(RuntimeError):
+    """Stopped early (time cap / cancelled); the .part is kept for resume."""
+
+
+def part_path(dest: str) -> str:
+    return f"{dest}.part"
+
+
+@contextmanager
+def metered(on_bytes):
+    """
+    Calls on_bytes(n) for every chunk downloaded by this thread inside
+    the block. It may block (throttling) or raise DownloadIncomplete.
+    """
+    previous = getattr(_meter, "on_bytes", None)
+    _meter.on_bytes = on_bytes
+    try:
+        yield
+    finally:
+        _meter.on_bytes = previous
+
+
+def charge(nbytes: int):
+    """
+    Reports nbytes fetched by this thread to the active meter, if any.
+    """
+    on_bytes = getattr(_meter, "on_bytes", None)
+    if on_bytes is not None:
+        on_bytes(nbytes)
+
+
+def single_flight(dest: str) -> FileLock:
+    """
+    Host-wide lock for one destination path (re-entrant per thread).
+    """
+    key = os.path.abspath(dest)
+    with _locks_guard:
+        lock = _locks.get(key)
+        if lock is None:
+            os.makedirs(LOCK_DIR, exist_ok=True)
+            digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+            lock = FileLock(os.path.join(LOCK_DIR, f"{digest}.lock"), timeout=LOCK_TIMEOUT_SEC)
+            _locks[key] = lock
+        return lock
+
+
+def _fetch_into(
+    url: str,
+    part: str,
+    max_bytes: int | None,
+    max_seconds: float | None,
+    should_stop,
+    timeout: float,
+    retries: int
+) -> bool:
+    """
+    Appends the rest of url to part. Returns True if the size cap
+    cut the file short (caller decides whether that is acceptable).
+    """
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else None
+    start = time.time()
+
+    try:
+        with http_client.stream(url, headers=headers, timeout=timeout, retries=retries) as r:
+            # Server ignored Range → start over
+            mode = "ab" if offset and r.status_code == 206 else "wb"
+            total = offset if mode == "ab" else 0
+
+            with open(part, mode) as f:
+                for chunk in r.iter_bytes(CHUNK_SIZE):
+                    if not chunk:
+                        continue
+
+                    f.write(chunk)
+                    total += len(chunk)
+                    charge(len(chunk))
+
+                    if max_bytes and total >= max_bytes:
+                        return True
+
+                    if max_seconds and time.time() - start >= max_seconds:
+                        raise DownloadIncomplete(f"time cap after {total} bytes")
+
+                    if should_stop and should_stop():
+                        raise DownloadIncomplete("cancelled")
+
+    except httpx.HTTPStatusError as e:
+        # .part already holds the whole file
+        if offset and e.response.status_code == 416:
+            return False
+        raise
+
+    return False
+
+
+def download_atomic(
+    url: str,
+    dest: str,
+    *,
+    validate=None,
+    min_bytes: int = 1,
+    max_bytes: int | None = None,
+    max_seconds: float | None = None,
+    should_stop=None,
+    timeout: float = http_client.DOWNLOAD_TIMEOUT_SEC,
+    retries: int = http_client.MAX_RETRIES,
+    replace=None
+) -> str:
+    """
+    Downloads url to dest atomically; returns dest.
+
+    validate(path) runs on the finished .part (raise or return False
+    to reject it). max_bytes truncates (only kept if it validates),
+    max_seconds / should_stop raise DownloadIncomplete and keep the
+    .part so the next attempt resumes. Other failures also keep the
+    .part; a rejected file is deleted.
+
+    replace(dest) -> True marks an existing dest as unusable (too-short
+    partial, corrupt); it is checked under the lock and the file is
+    swapped by the final rename — never deleted first, so a job already
+    holding the path keeps a readable file.
+    """
+    part = part_path(dest)
+
+    with single_flight(dest):
+        # Another thread/process finished it while we waited
+        if os.path.exists(dest) and not (replace and replace(dest)):
+            return dest
+
+        os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+        _fetch_into(url, part, max_bytes, max_seconds, should_stop, timeout, retries)
+
+        try:
+            ok = os.path.getsize(part) >= min_bytes and (validate is None or validate(part) is not False)
+        except Exception:
+            ok = False
+
+        if not ok:
+            os.remove(part)
+            raise RuntimeError(f"Downloaded file failed validation: {url}")
+
+        os.replace(part, dest)
+        return dest
@@ -2,6 +2,8 @@
 import subprocess
 import os
 
+from src.utils.resource_governor import cpu_slots, ffmpeg_threads
+
 
 def create_fallback_background(
     duration: float,
@@ -11,13 +13,15 @@ def create_fallback_background(
 ):
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-    cmd = [
-        "ffmpeg",
-        "-y",
-        "-f", "lavfi",
-        "-i", f"color=c={color}:s=1080x1920:r={fps}",
-        "-t", str(duration),
-        output_path
-    ]
+    with cpu_slots("fallback", heavy=True) as threads:
+        cmd = [
+            "ffmpeg",
+            "-y",
+            "-f", "lavfi",
+            "-i", f"color=c={color}:s=1080x1920:r={fps}",
+            "-t", str(duration),
+            *ffmpeg_threads(threads),
+            output_path
+        ]
 
-    subprocess.run(cmd, check=True)
+        subprocess.run(cmd, check=True)
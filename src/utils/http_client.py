@@ -0,0 +1,184 @@
+# src/utils/http_client.py
+import email.utils
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import httpx
+
+from src.utils import perf
+
+# ---------------- CONFIG ---------------- #
+
+SEARCH_TIMEOUT_SEC = 15
+DOWNLOAD_TIMEOUT_SEC = 30
+CONNECT_TIMEOUT_SEC = 5
+
+MAX_RETRIES = 3
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BACKOFF_BASE_SEC = 0.5
+BACKOFF_MAX_SEC = 20.0
+# Longer Retry-After waits than this are not worth it: give up instead
+RETRY_AFTER_MAX_SEC = 60.0
+
+USER_AGENT = "ai-shorts-bot/1.0"
+
+# HTTP/2 only if the optional h2 package is present
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
+
+
+# ---------------- CLIENT ---------------- #
+
+def get_client() -> httpx.Client:
+    """
+    Process-wide pooled client (keep-alive per host, thread-safe).
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(
+                http2=HTTP2,
+                follow_redirects=True,
+                headers={"User-Agent": USER_AGENT},
+                timeout=httpx.Timeout(SEARCH_TIMEOUT_SEC, connect=CONNECT_TIMEOUT_SEC),
+                limits=httpx.Limits(
+                    max_connections=32,
+                    max_keepalive_connections=16,
+                    keepalive_expiry=60,
+                ),
+            )
+        return _client
+
+
+def _timeout(seconds: float | None):
+    if seconds is None:
+        return httpx.USE_CLIENT_DEFAULT
+    return httpx.Timeout(seconds, connect=min(seconds, CONNECT_TIMEOUT_SEC))
+
+
+def _count(url: str, **amounts):
+    perf.incr("http", urlsplit(url).netloc, **amounts)
+
+
+# ---------------- RETRY ---------------- #
+
+def _retry_after(resp: httpx.Response) -> float | None:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+
+    if value.isdigit():
+        return float(value)
+
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt: int, resp: httpx.Response | None = None) -> float | None:
+    """
+    Seconds to wait before the next attempt; None = server asked for a
+    longer Retry-After than RETRY_AFTER_MAX_SEC (do not retry).
+    """
+    if resp is not None:
+        hinted = _retry_after(resp)
+        if hinted is not None:
+            return hinted if hinted <= RETRY_AFTER_MAX_SEC else None
+
+    ceiling = min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+# ---------------- PUBLIC API ---------------- #
+
+def get(
+    url: str,
+    *,
+    params: dict | None = None,
+    headers: dict | None = None,
+    timeout: float | None = None,
+    retries: int = MAX_RETRIES
+) -> httpx.Response:
+    """
+    GET with pooled connections and retry on transport errors / 429 / 5xx.
+    Honors Retry-After up to RETRY_AFTER_MAX_SEC (longer = final).
+    Raises httpx.HTTPError on final failure.
+    """
+    client = get_client()
+
+    for attempt in range(retries + 1):
+        try:
+            resp = client.get(url, params=params, headers=headers, timeout=_timeout(timeout))
+        except httpx.TransportError:
+            _count(url, requests=1, errors=1)
+            if attempt >= retries:
+                raise
+            time.sleep(_backoff(attempt))
+            continue
+
+        _count(url, requests=1, bytes=resp.num_bytes_downloaded)
+
+        if resp.status_code in RETRY_STATUSES and attempt < retries:
+            delay = _backoff(attempt, resp)
+            if delay is not None:
+                time.sleep(delay)
+                continue
+
+        resp.raise_for_status()
+        return resp
+
+    raise RuntimeError("unreachable")
+
+
+@contextmanager
+def stream(
+    url: str,
+    *,
+    headers: dict | None = None,
+    timeout: float | None = DOWNLOAD_TIMEOUT_SEC,
+    retries: int = MAX_RETRIES
+):
+    """
+    Streaming GET. Retries apply to opening the response only.
+    Yields an httpx.Response (use resp.iter_bytes()).
+    """
+    client = get_client()
+
+    for attempt in range(retries + 1):
+        try:
+            cm = client.stream("GET", url, headers=headers, timeout=_timeout(timeout))
+            resp = cm.__enter__()
+        except httpx.TransportError:
+            _count(url, requests=1, errors=1)
+            if attempt >= retries:
+                raise
+            time.sleep(_backoff(attempt))
+            continue
+
+        delay = None
+        if resp.status_code in RETRY_STATUSES and attempt < retries:
+            delay = _backoff(attempt, resp)
+        if delay is not None:
+            _count(url, requests=1)
+            cm.__exit__(None, None, None)
+            time.sleep(delay)
+            continue
+
+        try:
+            resp.raise_for_status()
+            yield resp
+        finally:
+            _count(url, requests=1, bytes=resp.num_bytes_downloaded)
+            cm.__exit__(None, None, None)
+        return
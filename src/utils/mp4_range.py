@@ -0,0 +1,356 @@
+# src/utils/mp4_range.py
+"""
+Partial MP4 fetch over HTTP Range.
+
+Reads ftyp + moov, picks a time window, and downloads only the byte
+ranges holding that window's video samples (from the preceding
+keyframe). Everything else in the file is left as a sparse hole, so
+ffmpeg can seek into the window exactly as it would on the full file.
+"""
+import json
+import os
+import random
+import re
+import struct
+
+from src.utils import http_client
+from src.utils.downloads import CHUNK_SIZE, charge
+
+# First request: enough for ftyp + a faststart moov header
+HEAD_PROBE_BYTES = 64 * 1024
+
+# Extra media fetched after the window (demuxer read-ahead)
+PAD_SEC = 1.5
+
+# Sample ranges closer than this are fetched as one request
+MERGE_GAP_BYTES = 256 * 1024
+
+# Below this, a partial fetch saves too little to bother
+MIN_SAVING_RATIO = 0.6
+
+
+class RangeNotSupported(Exception):
+    """Server ignored Range, or the file layout needs a full download."""
+
+
+# -------------------------------------------------
+# WINDOW SIDECAR
+# -------------------------------------------------
+
+def window_path(path: str) -> str:
+    return f"{path}.window.json"
+
+
+def read_window(path: str) -> tuple[float, float] | None:
+    """
+    (start, end) seconds of the playable window of a partial file,
+    or None for a complete file.
+    """
+    try:
+        with open(window_path(path), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return float(data["start"]), float(data["end"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_window(path: str, start: float, end: float):
+    with open(window_path(path), "w", encoding="utf-8") as f:
+        json.dump({"start": round(start, 3), "end": round(end, 3)}, f)
+
+
+# -------------------------------------------------
+# HTTP
+# -------------------------------------------------
+
+def _fetch(url: str, start: int, end: int) -> tuple[bytes, int]:
+    """
+    Bytes [start, end] inclusive + total file size.
+    """
+    with http_client.stream(url, headers={"Range": f"bytes={start}-{end}"}) as r:
+        if r.status_code != 206:
+            raise RangeNotSupported(f"HTTP {r.status_code} for Range request")
+
+        m = re.match(r"bytes \d+-\d+/(\d+)", r.headers.get("Content-Range", ""))
+        if not m:
+            raise RangeNotSupported("missing Content-Range total")
+
+        data = bytearray()
+        for chunk in r.iter_bytes(CHUNK_SIZE):
+            data += chunk
+            charge(len(chunk))
+        return bytes(data), int(m.group(1))
+
+
+# -------------------------------------------------
+# BOX PARSING
+# -------------------------------------------------
+
+def _box_header(buf: bytes, pos: int) -> tuple[str, int, int] | None:
+    """
+    (type, header_len, box_size) at pos, or None if buf is too short.
+    """
+    if pos + 8 > len(buf):
+        return None
+
+    size, typ = struct.unpack(">I4s", buf[pos:pos + 8])
+    header = 8
+    if size == 1:
+        if pos + 16 > len(buf):
+            return None
+        size = struct.unpack(">Q", buf[pos + 8:pos + 16])[0]
+        header = 16
+
+    return typ.decode("latin-1"), header, size
+
+
+def _children(buf: bytes, start: int, end: int):
+    pos = start
+    while pos + 8 <= end:
+        hdr = _box_header(buf, pos)
+        if hdr is None:
+            return
+        typ, header, size = hdr
+        if size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield typ, pos + header, pos + size
+        pos += size
+
+
+def _find(buf: bytes, start: int, end: int, typ: str):
+    for t, s, e in _children(buf, start, end):
+        if t == typ:
+            return s, e
+    return None
+
+
+def _u32s(buf: bytes, pos: int, count: int) -> list[int]:
+    return list(struct.unpack(f">{count}I", buf[pos:pos + 4 * count]))
+
+
+def _video_samples(moov: bytes) -> dict:
+    """
+    Sample table of the first video track:
+    timescale, decode times, sizes, file offsets, sync sample indexes.
+    """
+    for typ, ts, te in _children(moov, 0, len(moov)):
+        if typ != "trak":
+            continue
+
+        mdia = _find(moov, ts, te, "mdia")
+        if not mdia:
+            continue
+
+        hdlr = _find(moov, *mdia, "hdlr")
+        if not hdlr or moov[hdlr[0] + 8:hdlr[0] + 12] != b"vide":
+            continue
+
+        mdhd = _find(moov, *mdia, "mdhd")
+        version = moov[mdhd[0]]
+        timescale = struct.unpack(
+            ">I",
+            moov[mdhd[0] + (20 if version == 1 else 12):][:4]
+        )[0]
+
+        minf = _find(moov, *mdia, "minf")
+        stbl = _find(moov, *minf, "stbl")
+        boxes = {t: (s, e) for t, s, e in _children(moov, *stbl)}
+
+        # stts → decode times
+        s, _ = boxes["stts"]
+        n = struct.unpack(">I", moov[s + 4:s + 8])[0]
+        raw = _u32s(moov, s + 8, n * 2)
+        times, t = [], 0
+        for count, delta in zip(raw[0::2], raw[1::2]):
+            for _ in range(count):
+                times.append(t)
+                t += delta
+        total = t
+
+        # stsz → sizes
+        s, _ = boxes["stsz"]
+        fixed, count = struct.unpack(">II", moov[s + 4:s + 12])
+        sizes = [fixed] * count if fixed else _u32s(moov, s + 12, count)
+
+        # stco / co64 → chunk offsets
+        if "stco" in boxes:
+            s, _ = boxes["stco"]
+            n = struct.unpack(">I", moov[s + 4:s + 8])[0]
+            chunks = _u32s(moov, s + 8, n)
+        else:
+            s, _ = boxes["co64"]
+            n = struct.unpack(">I", moov[s + 4:s + 8])[0]
+            chunks = list(struct.unpack(f">{n}Q", moov[s + 8:s + 8 + 8 * n]))
+
+        # stsc → samples per chunk
+        s, _ = boxes["stsc"]
+        n = struct.unpack(">I", moov[s + 4:s + 8])[0]
+        runs = _u32s(moov, s + 8, n * 3)
+        firsts, per_chunk = runs[0::3], runs[1::3]
+
+        offsets = []
+        sample = 0
+        for r, first in enumerate(firsts):
+            last = firsts[r + 1] - 1 if r + 1 < len(firsts) else len(chunks)
+            for chunk in range(first, last + 1):
+                pos = chunks[chunk - 1]
+                for _ in range(per_chunk[r]):
+                    if sample >= len(sizes):
+                        break
+                    offsets.append(pos)
+                    pos += sizes[sample]
+                    sample += 1
+
+        # stss → keyframes (absent = every sample is a keyframe)
+        if "stss" in boxes:
+            s, _ = boxes["stss"]
+            n = struct.unpack(">I", moov[s + 4:s + 8])[0]
+            sync = [i - 1 for i in _u32s(moov, s + 8, n)]
+        else:
+            sync = list(range(len(sizes)))
+
+        return {
+            "timescale": timescale,
+            "times": times[:len(offsets)],
+            "sizes": sizes[:len(offsets)],
+            "offsets": offsets,
+            "sync": sync,
+            "duration": total / timescale,
+        }
+
+    raise RangeNotSupported("no video track")
+
+
+# -------------------------------------------------
+# PLANNING
+# -------------------------------------------------
+
+def plan_window(samples: dict, segment: float, start: float | None = None) -> dict:
+    """
+    Chooses a window of `segment` seconds and the byte ranges
+    (merged, sorted) needed to decode it from its keyframe.
+    """
+    ts = samples["timescale"]
+    times = samples["times"]
+    duration = samples["duration"]
+
+    if start is None:
+        max_start = max(0.0, duration - segment - PAD_SEC - 0.5)
+        start = random.uniform(0, max_start) if max_start > 0 else 0.0
+
+    end = min(duration, start + segment)
+    fetch_end = min(duration, end + PAD_SEC)
+
+    key = max((i for i in samples["sync"] if times[i] <= start * ts), default=0)
+    last = next(
+        (i for i in range(key, len(times)) if times[i] >= fetch_end * ts),
+        len(times) - 1
+    )
+
+    spans = sorted(
+        (samples["offsets"][i], samples["offsets"][i] + samples["sizes"][i])
+        for i in range(key, last + 1)
+    )
+
+    merged = []
+    for a, b in spans:
+        if merged and a - merged[-1][1] <= MERGE_GAP_BYTES:
+            merged[-1][1] = max(merged[-1][1], b)
+        else:
+            merged.append([a, b])
+
+    return {
+        "start": times[key] / ts,
+        "end": end,
+        "ranges": [(a, b) for a, b in merged],
+        "bytes": sum(b - a for a, b in merged),
+    }
+
+
+# -------------------------------------------------
+# PUBLIC API
+# -------------------------------------------------
+
+def download_segment(url: str, dest: str, segment: float, validate=None) -> tuple[float, float]:
+    """
+    Downloads only what is needed to play `segment` seconds of the MP4
+    at url into dest (sparse file, same byte layout as the original).
+    Writes a window sidecar and returns (start, end) seconds.
+
+    validate(path) runs on the assembled file before it is moved into
+    place (raise or return False to reject it).
+
+    Raises RangeNotSupported when a full download should be used
+    instead (no Range support, moov after mdat, little to save).
+    """
+    head, total = _fetch(url, 0, HEAD_PROBE_BYTES - 1)
+
+    # Walk top-level boxes until moov; mdat first means moov-at-end
+    pos = 0
+    moov = None
+    while pos < total:
+        if pos + 16 <= len(head):
+            hdr = _box_header(head, pos)
+        else:
+            small, _ = _fetch(url, pos, min(pos + 15, total - 1))
+            hdr = _box_header(small, 0)
+
+        if hdr is None:
+            raise RangeNotSupported("truncated box header")
+
+        typ, header, size = hdr
+        if size == 0:
+            size = total - pos
+
+        if typ == "mdat":
+            raise RangeNotSupported("moov after mdat")
+
+        if typ == "moov":
+            moov = (pos, pos + size, header)
+            break
+
+        pos += size
+
+    if moov is None:
+        raise RangeNotSupported("no moov box")
+
+    moov_start, moov_end, moov_header = moov
+    if moov_end <= len(head):
+        moov_bytes = head[moov_start:moov_end]
+    else:
+        have = head[moov_start:] if moov_start < len(head) else b""
+        rest, _ = _fetch(url, moov_start + len(have), moov_end - 1)
+        moov_bytes = have + rest
+
+    samples = _video_samples(moov_bytes[moov_header:])
+    plan = plan_window(samples, segment)
+
+    if len(head) + len(moov_bytes) + plan["bytes"] > total * MIN_SAVING_RATIO:
+        raise RangeNotSupported("partial fetch would save little")
+
+    tmp = f"{dest}.{os.getpid()}.range.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.truncate(total)
+            f.write(head)
+            f.seek(moov_start)
+            f.write(moov_bytes)
+
+            for a, b in plan["ranges"]:
+                data, _ = _fetch(url, a, b - 1)
+                f.seek(a)
+                f.write(data)
+
+        if validate is not None and validate(tmp) is False:
+            raise RuntimeError("partial file failed validation")
+
+        # Sidecar first: a reader must never see a partial file without it
+        _write_window(dest, plan["start"], plan["end"])
+        os.replace(tmp, dest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    return plan["start"], plan["end"]
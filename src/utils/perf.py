@@ -0,0 +1,126 @@
+# src/utils/perf.py
+import copy
+import json
+import os
+import threading
+import time
+
+from filelock import FileLock
+
+# Rolling (cross-job) summaries live here
+PERF_DIR = "assets/perf"
+LOCK_DIR = "assets/locks"
+
+# How long a summary update waits for another process's update
+SUMMARY_LOCK_TIMEOUT_SEC = 10
+
+# Weight of the newest sample in rolling averages
+EWMA_ALPHA = 0.1
+
+_lock = threading.Lock()
+_report = {
+    "job_id": None,
+    "started_at": None,
+    "events": {},
+    "counters": {},
+}
+
+
+# ---------------- JOB REPORT ---------------- #
+
+def start_job(job_id: str):
+    """
+    Resets the in-process report for a new job.
+    """
+    with _lock:
+        _report["job_id"] = job_id
+        _report["started_at"] = time.time()
+        _report["events"] = {}
+        _report["counters"] = {}
+
+
+def record(section: str, entry: dict):
+    """
+    Appends one event (e.g. a single LLM call) to the job report.
+    """
+    with _lock:
+        _report["events"].setdefault(section, []).append(dict(entry))
+
+
+def incr(section: str, key: str, **amounts):
+    """
+    Adds to named counters, e.g. incr("http", host, requests=1, bytes=n).
+    """
+    with _lock:
+        bucket = _report["counters"].setdefault(section, {}).setdefault(key, {})
+        for name, value in amounts.items():
+            bucket[name] = bucket.get(name, 0) + value
+
+
+def snapshot() -> dict:
+    with _lock:
+        data = copy.deepcopy(_report)
+    if data["started_at"]:
+        data["elapsed"] = round(time.time() - data["started_at"], 3)
+    return data
+
+
+def write_report(path: str) -> dict:
+    data = snapshot()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    return data
+
+
+# ---------------- ROLLING SUMMARY ---------------- #
+
+def _summary_path(name: str) -> str:
+    return os.path.join(PERF_DIR, f"{name}_summary.json")
+
+
+def load_summary(name: str) -> dict:
+    path = _summary_path(name)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def update_summary(name: str, key: str, values: dict):
+    """
+    Folds one sample into a persistent per-key summary:
+    count, running totals and an EWMA for every numeric value.
+    Serialized across processes (file lock); raises OSError (incl. a
+    lock timeout) if the sample could not be written.
+    """
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    file_lock = FileLock(
+        os.path.join(LOCK_DIR, f"perf_{name}.lock"), timeout=SUMMARY_LOCK_TIMEOUT_SEC
+    )
+
+    with _lock, file_lock:
+        data = load_summary(name)
+        entry = data.setdefault(key, {"count": 0, "totals": {}, "ewma": {}})
+        entry["count"] += 1
+
+        for metric, value in values.items():
+            if value is None:
+                continue
+            entry["totals"][metric] = round(entry["totals"].get(metric, 0) + value, 4)
+            prev = entry["ewma"].get(metric)
+            entry["ewma"][metric] = round(
+                value if prev is None else prev + EWMA_ALPHA * (value - prev), 4
+            )
+
+        entry["updated_at"] = time.time()
+
+        os.makedirs(PERF_DIR, exist_ok=True)
+        path = _summary_path(name)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, path)
@@ -0,0 +1,143 @@
+# src/utils/resource_governor.py
+"""
+Host-wide CPU budget for ffmpeg and torch.
+
+Every heavy subprocess asks for CPU slots before it starts and is told
+how many threads to use (-threads / x264 threads / torch threads).
+Slots are lock files under assets/locks/cpu, so pipelines in separate
+processes share one budget. Heavy encodes are also capped by core
+count and available memory. Every admission is logged.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from filelock import FileLock, Timeout
+
+from src.utils.logger import logger
+
+LOCK_DIR = "assets/locks/cpu"
+
+# CPU slots on this host (one per core unless overridden)
+CPU_SLOTS = int(os.getenv("GOVERNOR_CPU_SLOTS", "0")) or (os.cpu_count() or 2)
+
+# Threads each kind of work asks for (granted fewer when the host is busy)
+KIND_THREADS = {
+    "render": max(2, CPU_SLOTS // 2),
+    "normalize": max(2, CPU_SLOTS // 2),
+    "fallback": 2,
+    "whisper": max(1, CPU_SLOTS // 2),
+    "concat": 1,
+    "subtitles": 1,
+}
+
+# What one x264 1080x1920 encode needs to make reasonable progress:
+# threads (below this, encodes crawl) and resident memory
+HEAVY_ENCODE_THREADS = 3
+HEAVY_ENCODE_BYTES = 1024 * 1024 * 1024
+
+POLL_SEC = 0.2
+
+
+def _available_memory() -> int | None:
+    try:
+        with open("/proc/meminfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        return None
+
+
+def max_heavy_encodes() -> int:
+    """
+    Concurrent heavy encodes this host can take: HEAVY_ENCODE_THREADS
+    cores and HEAVY_ENCODE_BYTES of free memory for each.
+    """
+    by_cores = max(1, CPU_SLOTS // HEAVY_ENCODE_THREADS)
+    memory = _available_memory()
+    if memory is None:
+        return by_cores
+    return max(1, min(by_cores, memory // HEAVY_ENCODE_BYTES))
+
+
+def _try_slots(prefix: str, total: int, want: int) -> list[FileLock]:
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    held = []
+    for i in range(total):
+        if len(held) >= want:
+            break
+        lock = FileLock(os.path.join(LOCK_DIR, f"{prefix}_{i}.lock"), timeout=0)
+        try:
+            lock.acquire()
+            held.append(lock)
+        except Timeout:
+            continue
+    return held
+
+
+def _release(locks: list[FileLock]):
+    for lock in locks:
+        try:
+            lock.release()
+        except Exception:
+            pass
+
+
+@contextmanager
+def cpu_slots(kind: str, heavy: bool = False):
+    """
+    Blocks until at least one CPU slot (and, for heavy work, one encode
+    slot) is free. Yields the number of threads to use.
+    """
+    want = min(KIND_THREADS.get(kind, 1), CPU_SLOTS)
+    start = time.time()
+    encode: list[FileLock] = []
+    slots: list[FileLock] = []
+
+    try:
+        if heavy:
+            limit = max_heavy_encodes()
+            while not (encode := _try_slots("encode", limit, 1)):
+                time.sleep(POLL_SEC)
+
+        while not (slots := _try_slots("slot", CPU_SLOTS, want)):
+            time.sleep(POLL_SEC)
+
+        waited = time.time() - start
+        logger.info(
+            f"🚦 {kind}: {len(slots)}/{want} threads"
+            f"{' (heavy)' if heavy else ''}, waited {waited:.1f}s"
+        )
+        yield len(slots)
+
+    finally:
+        _release(slots)
+        _release(encode)
+
+
+# -------------------------------------------------
+# THREAD OPTIONS
+# -------------------------------------------------
+
+def ffmpeg_threads(threads: int) -> list[str]:
+    """
+    Output options for one encode: codec threads plus x264's own pools.
+    """
+    return [
+        "-threads", str(threads),
+        "-x264-params", f"threads={threads}:lookahead-threads={max(1, threads // 4)}",
+    ]
+
+
+def filter_threads(threads: int) -> list[str]:
+    """
+    Global options bounding ffmpeg's filter graph threads.
+    """
+    return ["-filter_threads", str(threads), "-filter_complex_threads", str(threads)]
@@ -0,0 +1,114 @@
+# src/utils/search_cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+
+from src.utils import perf
+from src.utils.logger import logger
+
+CACHE_DIR = "assets/search_cache"
+
+# Served without network while fresh
+FRESH_TTL_SEC = 24 * 3600
+
+# Served immediately (and refreshed in the background) while stale
+STALE_TTL_SEC = 7 * 24 * 3600
+
+_revalidating: set[str] = set()
+_lock = threading.Lock()
+
+
+# ---------------- STORAGE ---------------- #
+
+def _path(provider: str, query: str, params: dict) -> str:
+    raw = json.dumps({"q": query, "params": params}, sort_keys=True, ensure_ascii=False)
+    digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, provider, f"{digest}.json")
+
+
+def _read(path: str) -> dict | None:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path: str, query: str, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"fetched_at": time.time(), "query": query, "data": data}, f)
+    os.replace(tmp, path)
+
+
+# ---------------- REVALIDATION ---------------- #
+
+def _revalidate(path: str, provider: str, query: str, fetch):
+    try:
+        _write(path, query, fetch())
+    except Exception as e:
+        logger.debug(f"Search revalidation failed ({provider}): {e}")
+    finally:
+        with _lock:
+            _revalidating.discard(path)
+
+
+def _revalidate_async(path: str, provider: str, query: str, fetch):
+    with _lock:
+        if path in _revalidating:
+            return
+        _revalidating.add(path)
+
+    threading.Thread(
+        target=_revalidate,
+        args=(path, provider, query, fetch),
+        name="search-revalidate",
+        daemon=True,
+    ).start()
+
+
+# ---------------- PUBLIC API ---------------- #
+
+def cached_search(provider: str, query: str, params: dict, fetch):
+    """
+    Returns fetch()'s result, cached on disk per (provider, query, params).
+
+    - fresh  → served from disk, no network
+    - stale  → served from disk, refreshed in the background
+    - miss   → fetched; if the provider fails, an expired entry is
+               better than nothing (rate limits during large batches)
+
+    params must not contain secrets (API keys) — they form the key.
+    """
+    path = _path(provider, query, params)
+    entry = _read(path)
+    age = time.time() - entry["fetched_at"] if entry else None
+
+    if entry and age < FRESH_TTL_SEC:
+        perf.incr("search_cache", provider, hits=1)
+        return entry["data"]
+
+    if entry and age < STALE_TTL_SEC:
+        perf.incr("search_cache", provider, stale=1)
+        _revalidate_async(path, provider, query, fetch)
+        return entry["data"]
+
+    perf.incr("search_cache", provider, misses=1)
+
+    try:
+        data = fetch()
+    except Exception:
+        if entry:
+            logger.warning(f"🔎 {provider} search failed — serving expired cache")
+            return entry["data"]
+        raise
+
+    try:
+        _write(path, query, data)
+    except OSError as e:
+        logger.debug(f"Search cache write failed: {e}")
+
+    return data
@@ -5,6 +5,8 @@ import tempfile
 import shutil
 from typing import Optional
 
+from src.utils.resource_governor import cpu_slots
+
 
 SAFE_ASS_HEADER = """[Script Info]
 ScriptType: v4.00+
@@ -41,18 +43,20 @@ def srt_to_ass(srt_path: str) -> Optional[str]:
 
     try:
         # Step 1: Convert SRT -> ASS using ffmpeg
-        cmd = [
-            "ffmpeg", "-y",
-            "-i", srt_path,
-            tmp_ass_path
-        ]
-
-        subprocess.run(
-            cmd,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            check=True
-        )
+        with cpu_slots("subtitles") as threads:
+            cmd = [
+                "ffmpeg", "-y",
+                "-threads", str(threads),
+                "-i", srt_path,
+                tmp_ass_path
+            ]
+
+            subprocess.run(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                check=True
+            )
 
         if not os.path.exists(tmp_ass_path):
             return None
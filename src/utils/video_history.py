@@ -1,38 +1,137 @@
 import json
 import os
+import threading
 import time
 from typing import Set
 
-HISTORY_PATH = "assets/video_history.json"
+from src.utils.db import connect
+
+HISTORY_PATH = "assets/video_history.db"
+LEGACY_JSON_PATH = "assets/video_history.json"
 MAX_AGE_SECONDS = 7 * 24 * 3600  # 7 days
 
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS video_history (
+    platform TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    used_at REAL NOT NULL,
+    PRIMARY KEY (platform, video_id)
+);
+CREATE INDEX IF NOT EXISTS idx_video_history_time ON video_history(platform, used_at);
+"""
+
+# platform -> (table version seen, {video_id: used_at})
+_cache: dict[str, tuple[tuple, dict[str, float]]] = {}
+_cache_lock = threading.Lock()
+_ready = False
+
+
+def _db():
+    global _ready
+    conn = connect(HISTORY_PATH)
+    if not _ready:
+        conn.executescript(SCHEMA)
+        _migrate_legacy(conn)
+        _ready = True
+    return conn
+
+
+def _migrate_legacy(conn):
+    """
+    One-time import of video_history.json (recent entries only).
+    """
+    if not os.path.exists(LEGACY_JSON_PATH):
+        return
+
+    try:
+        with open(LEGACY_JSON_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return
+
+    cutoff = time.time() - MAX_AGE_SECONDS
+    rows = [
+        (platform, vid, ts)
+        for platform, entries in data.items()
+        for vid, ts in entries.items()
+        if ts >= cutoff
+    ]
 
-def _load_history() -> dict:
-    if not os.path.exists(HISTORY_PATH):
-        return {}
-    with open(HISTORY_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO video_history (platform, video_id, used_at) VALUES (?, ?, ?)",
+            rows,
+        )
 
+    try:
+        os.replace(LEGACY_JSON_PATH, f"{LEGACY_JSON_PATH}.migrated")
+    except OSError:
+        pass  # another job migrated it first
 
-def _save_history(data: dict):
-    os.makedirs(os.path.dirname(HISTORY_PATH), exist_ok=True)
-    with open(HISTORY_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+
+def _version(conn, platform: str) -> tuple:
+    """
+    Changes on every write: a new row always gets a higher rowid, a
+    prune lowers the count (used_at can commit out of order).
+    """
+    return tuple(conn.execute(
+        "SELECT COUNT(*), MAX(rowid) FROM video_history WHERE platform = ?", (platform,)
+    ).fetchone())
 
 
 def get_recent_video_ids(platform: str) -> Set[str]:
-    data = _load_history()
+    """
+    IDs used on platform within MAX_AGE_SECONDS.
+    Served from memory; reloaded only when another job has written.
+    """
+    conn = _db()
     now = time.time()
 
-    entries = data.get(platform, {})
-    return {
-        vid for vid, ts in entries.items()
-        if now - ts < MAX_AGE_SECONDS
-    }
+    latest = _version(conn, platform)
+
+    with _cache_lock:
+        cached = _cache.get(platform)
+        if cached is None or cached[0] != latest:
+            rows = conn.execute(
+                "SELECT video_id, used_at FROM video_history "
+                "WHERE platform = ? AND used_at >= ?",
+                (platform, now - MAX_AGE_SECONDS),
+            ).fetchall()
+            cached = (latest, {r["video_id"]: r["used_at"] for r in rows})
+            _cache[platform] = cached
+
+        return {
+            vid for vid, ts in cached[1].items()
+            if now - ts < MAX_AGE_SECONDS
+        }
 
 
 def mark_video_used(platform: str, video_id: str):
-    data = _load_history()
-    data.setdefault(platform, {})
-    data[platform][video_id] = time.time()
-    _save_history(data)
+    conn = _db()
+    now = time.time()
+
+    with conn:
+        # Prune on write: the table only ever holds the reuse window.
+        # Also takes the write lock, so the two versions bracket our insert.
+        conn.execute(
+            "DELETE FROM video_history WHERE platform = ? AND used_at < ?",
+            (platform, now - MAX_AGE_SECONDS),
+        )
+        before = _version(conn, platform)
+        conn.execute(
+            "INSERT OR REPLACE INTO video_history (platform, video_id, used_at) VALUES (?, ?, ?)",
+            (platform, video_id, now),
+        )
+        latest = _version(conn, platform)
+
+    with _cache_lock:
+        cached = _cache.get(platform)
+        if cached is None:
+            return
+
+        if cached[0] == before:
+            # Cache was current → apply our write in place
+            cached[1][video_id] = now
+            _cache[platform] = (latest, cached[1])
+        else:
+            _cache.pop(platform, None)
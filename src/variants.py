@@ -0,0 +1,353 @@
+# src/variants.py
+"""
+A/B variant mode: one idea, a matrix of hook × voice × music × CTA.
+
+Shared layers are built once and reused by every variant: script body,
+normalized background, music stems (decoded once), metadata and the
+caption style. Speech and captions are built per (text, voice) segment,
+so a hook variant only synthesizes and transcribes its hook. Each
+variant then only mixes and encodes.
+
+variants.json lists the outputs and the compute saved against running
+generate_short once per variant.
+"""
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from src.services.script_service import generate_script
+from src.services.tts_service import speak
+from src.services.cta_service import cta_reserve, cta_pool
+from src.services.background_service import (
+    build_speculative, finish_background, speculative_duration
+)
+from src.services.metadata_service import build_metadata
+
+from src.captions_whisper import transcribe_words, write_srt
+from src.utils.srt_to_ass import srt_to_ass
+from src.render import render_video
+from src.bg_music_fetcher import fetch_background_music
+from src import music_library
+from src.audio_mix import mix_audio
+from src.utils.audio_buffer import AudioBuffer
+from src.utils.logger import logger
+from src.utils import perf, cache_manager
+from src.config.languages import get_random_voice
+from src.config.limits import MAX_SHORT_SECONDS
+from src.config.platforms import get_targets
+from src.text_utils import sanitize_for_tts
+from src.speech_duration import predict_duration
+
+# Refuse accidental combinatorial explosions
+MAX_VARIANTS = 24
+
+
+class _Shared:
+    """
+    Built artifacts keyed by (stage, key), with what each one cost to
+    build and how many variants used it.
+    """
+
+    def __init__(self):
+        self.items: dict[tuple, dict] = {}
+        self._lock = threading.Lock()
+
+    def build(self, stage: str, key, fn):
+        with self._lock:
+            item = self.items.get((stage, key))
+        if item is None:
+            start = time.time()
+            value = fn()
+            item = {"value": value, "seconds": time.time() - start, "uses": 0}
+            with self._lock:
+                item = self.items.setdefault((stage, key), item)
+        return item["value"]
+
+    def get(self, stage: str, key, fn):
+        """
+        build() and count one use by the current variant.
+        """
+        value = self.build(stage, key, fn)
+        with self._lock:
+            self.items[(stage, key)]["uses"] += 1
+        return value
+
+    def report(self) -> dict:
+        stages: dict[str, dict] = {}
+        for (stage, _), item in self.items.items():
+            s = stages.setdefault(stage, {"built": 0, "uses": 0, "seconds": 0.0, "independent_seconds": 0.0})
+            s["built"] += 1
+            s["uses"] += item["uses"]
+            s["seconds"] += item["seconds"]
+            # A standalone run rebuilds the artifact every time it needs it
+            s["independent_seconds"] += item["seconds"] * max(1, item["uses"])
+
+        for s in stages.values():
+            s["seconds"] = round(s["seconds"], 2)
+            s["independent_seconds"] = round(s["independent_seconds"], 2)
+        return stages
+
+
+def _split_hook(script: str) -> tuple[str, str]:
+    """
+    (first sentence, rest). Hindi scripts end sentences with "।".
+    A script that will not split keeps everything in the body, so a
+    hook override is prepended instead of replacing the script.
+    """
+    parts = re.split(r"(?<=[.!?।])\s+", script.strip(), maxsplit=1)
+    if len(parts) < 2 or not parts[1].strip():
+        logger.warning("🧪 Script has no separate hook sentence; hooks are prepended")
+        return "", script.strip()
+    return parts[0], parts[1]
+
+
+def _speech(shared: _Shared, text: str, lang: str, voice: str):
+    """
+    (AudioBuffer, word timings) for one spoken segment, once per voice.
+    """
+    def synthesize():
+        path = speak(text, lang, voice=voice)
+        cache_manager.lease(path)
+        return AudioBuffer.from_file(path)
+
+    buf = shared.get("tts", (text, voice), synthesize)
+
+    def transcribe():
+        try:
+            return transcribe_words(buf)
+        except Exception as e:
+            logger.warning(f"⚠️ Caption generation failed: {e}")
+            return []
+
+    words = shared.get("captions", (text, voice), transcribe)
+    return buf, words
+
+
+def _music(shared: _Shared, idea: str, track: str | None):
+    """
+    (decoded music, gain dB, is_stem) — fetched, conditioned and decoded once.
+    """
+    path = track or shared.get("music_fetch", idea, lambda: fetch_background_music(idea))
+    cache_manager.lease(path)
+
+    stem = shared.get("music_stem", path, lambda: music_library.stem_for(path))
+    if stem:
+        music_file, gain = stem
+    else:
+        music_file, gain = path, music_library.gain_db(path)
+    cache_manager.lease(music_file)
+
+    music = shared.get("music_decode", music_file, lambda: AudioBuffer.from_file(music_file, channels=2))
+    return music, gain, stem is not None
+
+
+# -------------------------------------------------
+# PUBLIC API
+# -------------------------------------------------
+
+def generate_variants(
+    idea: str,
+    lang: str = "en",
+    hooks: list[str | None] | None = None,
+    voices: list[str] | None = None,
+    music: list[str | None] | None = None,
+    ctas: list[str | None] | None = None
+) -> dict:
+    """
+    Renders every combination of the given variations for one idea.
+
+    hooks: opening lines (None = the script's own hook)
+    voices: TTS voices (default: one random voice for lang)
+    music: cached track paths (None = fetched by mood)
+    ctas: CTA lines (None = no CTA)
+    """
+    hooks = hooks or [None]
+    voices = voices or [get_random_voice(lang)]
+    music = music or [None]
+    ctas = ctas or [random.choice(cta_pool(lang))]
+
+    matrix = list(itertools.product(hooks, voices, music, ctas))
+    if len(matrix) > MAX_VARIANTS:
+        raise ValueError(f"{len(matrix)} variants requested (max {MAX_VARIANTS})")
+
+    job_id = uuid.uuid4().hex[:8]
+    output_dir = os.path.join("outputs", f"{job_id}_variants")
+    shared_dir = os.path.join(output_dir, "shared")
+    os.makedirs(shared_dir, exist_ok=True)
+    perf.start_job(job_id)
+    cache_manager.lease(output_dir)
+
+    logger.info(f"🧪 VARIANTS: {idea} | {len(matrix)} combinations")
+
+    try:
+        report = _generate_variants(idea, lang, matrix, voices, output_dir, shared_dir)
+    finally:
+        cache_manager.release_leases()
+
+    try:
+        cache_manager.evict()
+    except Exception as e:
+        logger.warning(f"🧹 Cache eviction failed: {e}")
+
+    return report
+
+
+def _generate_variants(idea, lang, matrix, voices, output_dir, shared_dir) -> dict:
+    started = time.time()
+    shared = _Shared()
+
+    # Background depends only on the idea: build it while the script is
+    # written, sized from recent shorts' length; checked once the script
+    # is known
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="variants")
+    bg_duration = speculative_duration()
+    bg_future = pool.submit(
+        shared.build, "background", idea,
+        lambda: build_speculative(idea, bg_duration, shared_dir)
+    )
+    pool.shutdown(wait=False)
+
+    # ---------------- SHARED SCRIPT ---------------- #
+    # Sized for the slowest voice's CTA so every variant fits
+    reserve = max(cta_reserve(v, lang) for v in voices)
+    script = shared.build(
+        "script", idea,
+        lambda: generate_script(idea, lang, voice=voices[0], max_seconds=MAX_SHORT_SECONDS - reserve)
+    )
+    default_hook, body = _split_hook(script)
+
+    metadata = shared.build("metadata", idea, lambda: build_metadata(idea, script))
+    with open(os.path.join(output_dir, "metadata.json"), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False)
+
+    # Longest predicted variant (hook × voice, plus its CTA reserve)
+    needed = min(MAX_SHORT_SECONDS, max(
+        predict_duration(sanitize_for_tts(f"{hook or default_hook} {body}"), voice)
+        + cta_reserve(voice, lang)
+        for hook, voice, _, _ in matrix
+    ))
+    bg_video = finish_background(bg_future, idea, [], needed, shared_dir)
+
+    # ---------------- PER VARIANT ---------------- #
+    results = []
+    render_seconds = 0.0
+
+    for i, (hook, voice, track, cta) in enumerate(matrix, 1):
+        name = f"v{i:02d}"
+        vdir = os.path.join(output_dir, name)
+        os.makedirs(vdir, exist_ok=True)
+
+        # Every variant depends on the shared layers (counted as uses)
+        shared.get("script", idea, lambda: script)
+        shared.get("metadata", idea, lambda: metadata)
+        shared.get("background", idea, lambda: (bg_video, needed))
+
+        segments = [hook or default_hook, body, cta]
+        buffers, words, offset = [], [], 0.0
+        for text in segments:
+            if not text or not sanitize_for_tts(text).strip():
+                continue
+            buf, seg_words = _speech(shared, text, lang, voice)
+            words += [(s + offset, e + offset, w) for s, e, w in seg_words]
+            buffers.append(buf)
+            offset += buf.duration
+
+        voice_pcm = AudioBuffer.concat(buffers)
+        duration = min(voice_pcm.duration, MAX_SHORT_SECONDS)
+        if voice_pcm.duration > MAX_SHORT_SECONDS:
+            logger.warning(f"🧪 {name}: voice {voice_pcm.duration:.1f}s cut to {MAX_SHORT_SECONDS}s")
+
+        # Caption style (ASS header) is shared; only the words differ
+        subtitles_path = None
+        if words:
+            srt = os.path.join(vdir, "captions.srt")
+            write_srt([w for w in words if w[0] < duration], srt)
+            ass = srt_to_ass(srt)
+            if ass and os.path.exists(ass):
+                subtitles_path = ass
+
+        music_pcm, music_gain, is_stem = _music(shared, idea, track)
+
+        start = time.time()
+        audio_pcm = mix_audio(voice_pcm, music_pcm, duration, music_gain_db=music_gain, music_is_stem=is_stem)
+        outputs = render_video(
+            bg_video=bg_video,
+            audio_file=None,
+            music_file=None,
+            output_file=None,
+            duration=duration,
+            subtitles_path=subtitles_path,
+            audio_pcm=audio_pcm,
+            targets=get_targets(vdir)
+        )
+        render_seconds += time.time() - start
+
+        results.append({
+            "id": name,
+            "hook": hook or default_hook,
+            "voice": voice,
+            "music": track,
+            "cta": cta,
+            "duration": round(duration, 2),
+            "outputs": outputs,
+        })
+        logger.info(f"🧪 {name} rendered ({voice}, {duration:.1f}s)")
+
+    # ---------------- REPORT ---------------- #
+    stages = shared.report()
+    stages["render"] = {
+        "built": len(matrix),
+        "uses": len(matrix),
+        "seconds": round(render_seconds, 2),
+        "independent_seconds": round(render_seconds, 2),
+    }
+    actual = sum(s["seconds"] for s in stages.values())
+    independent = sum(s["independent_seconds"] for s in stages.values())
+
+    report = {
+        "idea": idea,
+        "variants": results,
+        "stages": stages,
+        "compute_seconds": round(actual, 2),
+        "independent_seconds": round(independent, 2),
+        "saved_seconds": round(independent - actual, 2),
+        "wall_seconds": round(time.time() - started, 2),
+    }
+
+    with open(os.path.join(output_dir, "variants.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    perf.write_report(os.path.join(output_dir, "perf.json"))
+
+    logger.info(
+        f"✅ {len(matrix)} VARIANTS → {output_dir} | compute {actual:.0f}s "
+        f"vs {independent:.0f}s independent (saved {independent - actual:.0f}s)"
+    )
+    return report
+
+
+# ---------------- ENTRY ---------------- #
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        raise RuntimeError('Usage: python -m src.variants "idea" [matrix.json] [lang]')
+
+    matrix_spec = {}
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], "r", encoding="utf-8") as f:
+            matrix_spec = json.load(f)
+
+    generate_variants(
+        sys.argv[1],
+        lang=sys.argv[3] if len(sys.argv) > 3 else "en",
+        hooks=matrix_spec.get("hooks"),
+        voices=matrix_spec.get("voices"),
+        music=matrix_spec.get("music"),
+        ctas=matrix_spec.get("ctas"),
+    )
@@ -6,6 +6,9 @@ import uuid
 import random
 import json
 
+from src.utils.mp4_range import read_window
+from src.utils.resource_governor import cpu_slots, ffmpeg_threads
+
 
 def _get_video_duration(path: str) -> float:
     result = subprocess.run(
@@ -23,12 +26,37 @@ def _get_video_duration(path: str) -> float:
     return float(data["streams"][0]["duration"])
 
 
+def probe_video(path: str) -> dict:
+    """
+    Width, height and duration of the first video stream.
+    """
+    result = subprocess.run(
+        [
+            "ffprobe", "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries", "stream=width,height,duration",
+            "-of", "json",
+            path
+        ],
+        capture_output=True,
+        text=True
+    )
+    stream = json.loads(result.stdout)["streams"][0]
+    return {
+        "width": int(stream["width"]),
+        "height": int(stream["height"]),
+        "duration": float(stream.get("duration", 0) or 0),
+    }
+
+
 def concat_background_clips(
     clips: list[str],
-    clip_durations: list[float]
+    clip_durations: list[float],
+    output_dir: str | None = None
 ) -> str:
     """
-    Portrait-safe background merger.
+    Portrait-safe background merger. Writes into output_dir (the job's
+    folder) so concurrent jobs never share a file; default bg_cache.
 
     ✔ TRUE 1080x1920 at source
     ✔ Random segment per reuse
@@ -43,61 +71,74 @@ def concat_background_clips(
     temp_clips = []
 
     for clip, duration in zip(clips, clip_durations):
-        clip_duration = _get_video_duration(clip)
+        # Partial (Range-fetched) clips only hold their window
+        window = read_window(clip)
+        if window:
+            win_start, win_end = window
+        else:
+            win_start, win_end = 0.0, _get_video_duration(clip)
 
-        max_start = max(0, clip_duration - duration - 0.5)
-        start_time = random.uniform(0, max_start) if max_start > 0 else 0
+        max_start = max(0, win_end - win_start - duration - 0.5)
+        start_time = win_start + (random.uniform(0, max_start) if max_start > 0 else 0)
 
         out = f"assets/bg_cache/trim_{uuid.uuid4().hex}.mp4"
 
         # 🔒 NORMALIZE EVERYTHING HERE (ONCE)
-        subprocess.run(
-            [
-                "ffmpeg", "-y",
-                "-ss", f"{start_time:.2f}",
-                "-i", clip,
-                "-t", f"{duration:.2f}",
-                "-vf",
-                (
-                    "scale=1080:1920:force_original_aspect_ratio=increase,"
-                    "crop=1080:1920,"
-                    "setsar=1,setdar=9/16"
-                ),
-                "-r", "30",
-                "-c:v", "libx264",
-                "-pix_fmt", "yuv420p",
-                "-profile:v", "high",
-                "-level", "4.1",
-                "-crf", "18",
-                "-preset", "slow",
-                "-an",
-                out
-            ],
-            check=True
-        )
+        with cpu_slots("normalize", heavy=True) as threads:
+            subprocess.run(
+                [
+                    "ffmpeg", "-y",
+                    "-ss", f"{start_time:.2f}",
+                    "-i", clip,
+                    "-t", f"{duration:.2f}",
+                    "-vf",
+                    (
+                        "scale=1080:1920:force_original_aspect_ratio=increase,"
+                        "crop=1080:1920,"
+                        "setsar=1,setdar=9/16"
+                    ),
+                    "-r", "30",
+                    "-c:v", "libx264",
+                    "-pix_fmt", "yuv420p",
+                    "-profile:v", "high",
+                    "-level", "4.1",
+                    "-crf", "18",
+                    "-preset", "slow",
+                    "-an",
+                    *ffmpeg_threads(threads),
+                    out
+                ],
+                check=True
+            )
 
         temp_clips.append(out)
 
     # ---------------- CONCAT (NO FILTERS, NO RE-ENCODE) ----------------
 
-    concat_file = "assets/bg_cache/concat_list.txt"
+    name = uuid.uuid4().hex[:8]
+    out_dir = output_dir or "assets/bg_cache"
+    os.makedirs(out_dir, exist_ok=True)
+
+    concat_file = os.path.join(out_dir, f"concat_list_{name}.txt")
     with open(concat_file, "w", encoding="utf-8") as f:
         for c in temp_clips:
             f.write(f"file '{os.path.abspath(c)}'\n")
 
-    merged = "assets/bg_cache/merged_background.mp4"
+    merged = os.path.join(out_dir, f"merged_background_{name}.mp4")
 
-    subprocess.run(
-        [
-            "ffmpeg", "-y",
-            "-f", "concat",
-            "-safe", "0",
-            "-i", concat_file,
-            "-c", "copy",   # 🔥 THIS IS CRITICAL
-            merged
-        ],
-        check=True
-    )
+    with cpu_slots("concat") as threads:
+        subprocess.run(
+            [
+                "ffmpeg", "-y",
+                "-threads", str(threads),
+                "-f", "concat",
+                "-safe", "0",
+                "-i", concat_file,
+                "-c", "copy",   # 🔥 THIS IS CRITICAL
+                merged
+            ],
+            check=True
+        )
 
     # ---------------- CLEANUP ----------------
 
@@ -0,0 +1,99 @@
+import sys
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.utils.mp4_range import download_segment, read_window, RangeNotSupported
+
+
+class RangeHandler(SimpleHTTPRequestHandler):
+    """Local stand-in for a CDN: serves single byte ranges."""
+
+    served = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        m = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if not m or not os.path.isfile(path):
+            return super().do_GET()
+
+        size = os.path.getsize(path)
+        start = int(m.group(1))
+        end = min(int(m.group(2) or size - 1), size - 1)
+
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start + 1)
+
+        RangeHandler.served += len(data)
+        self.send_response(206)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_clip(path: str, seconds: int, faststart: bool):
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=540x960:rate=30:duration={seconds}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-g", "60",
+    ]
+    if faststart:
+        cmd += ["-movflags", "+faststart"]
+    subprocess.run(cmd + [path], check=True)
+
+
+def decodes(path: str, start: float, duration: float) -> bool:
+    r = subprocess.run(
+        [
+            "ffmpeg", "-v", "error", "-ss", f"{start:.2f}", "-i", path,
+            "-t", f"{duration:.2f}", "-f", "null", "-"
+        ],
+        capture_output=True, text=True
+    )
+    return r.returncode == 0 and not r.stderr.strip()
+
+
+if __name__ == "__main__":
+    if not shutil.which("ffmpeg"):
+        sys.exit("ffmpeg not found")
+
+    root = tempfile.mkdtemp()
+    make_clip(os.path.join(root, "fast.mp4"), 40, faststart=True)
+    make_clip(os.path.join(root, "slow.mp4"), 40, faststart=False)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(RangeHandler, directory=root))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    dest = os.path.join(root, "partial.mp4")
+    start, end = download_segment(f"{base}/fast.mp4", dest, 6.0)
+    full = os.path.getsize(os.path.join(root, "fast.mp4"))
+
+    print(f"window: {start:.2f}s → {end:.2f}s")
+    print(f"fetched: {RangeHandler.served} / {full} bytes")
+    print("sidecar:", read_window(dest))
+    print("decodes:", decodes(dest, start, end - start))
+
+    try:
+        download_segment(f"{base}/slow.mp4", os.path.join(root, "slow_partial.mp4"), 6.0)
+        print("moov-at-end: partial fetch (unexpected)")
+    except RangeNotSupported as e:
+        print(f"moov-at-end: falls back ({e})")
+
+    server.shutdown()
+    shutil.rmtree(root)
@@ -2,6 +2,7 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from google.oauth2.credentials import Credentials
 import os
+import threading
 
 SCOPES = [
     "https://www.googleapis.com/auth/yt-analytics.readonly",
@@ -11,6 +12,10 @@ SCOPES = [
 TOKEN_PATH = "credentials/token.json"
 CLIENT_SECRET = "credentials/client_secret.json"
 
+_creds = None
+_creds_lock = threading.Lock()
+_local = threading.local()
+
 
 def get_credentials():
     if os.path.exists(TOKEN_PATH):
@@ -28,11 +33,31 @@ def get_credentials():
     return creds
 
 
+def _shared_credentials():
+    global _creds
+    with _creds_lock:
+        if _creds is None:
+            _creds = get_credentials()
+        return _creds
+
+
+# Built once per thread: httplib2 connections are not thread-safe, so
+# each thread reuses its own authorized client instead of sharing one
+# (and still avoids a fresh handshake per call).
+def _client(service: str, version: str):
+    clients = getattr(_local, "clients", None)
+    if clients is None:
+        clients = _local.clients = {}
+
+    key = (service, version)
+    if key not in clients:
+        clients[key] = build(service, version, credentials=_shared_credentials())
+    return clients[key]
+
+
 def get_analytics_client():
-    creds = get_credentials()
-    return build("youtubeAnalytics", "v2", credentials=creds)
+    return _client("youtubeAnalytics", "v2")
 
 
 def get_youtube_client():
-    creds = get_credentials()
-    return build("youtube", "v3", credentials=creds)
+    return _client("youtube", "v3")
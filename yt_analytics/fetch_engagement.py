@@ -2,14 +2,16 @@ from .auth import get_youtube_client
 from .fetch_videos import fetch_videos
 
 
-def fetch_engagement():
+def fetch_engagement(videos=None):
     """
     Fetch likes & comments for recent videos of the channel.
     Returns a dict keyed by video_id.
+    Pass `videos` (from fetch_videos) to skip re-listing the channel.
     """
     youtube = get_youtube_client()
 
-    videos = fetch_videos()
+    if videos is None:
+        videos = fetch_videos()
     video_ids = list(videos.keys())
 
     if not video_ids:
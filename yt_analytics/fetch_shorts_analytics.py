@@ -30,13 +30,14 @@ def fetch_video_analytics(video_id, start_date, end_date, analytics):
 
 # inside fetch_shorts_analytics.py
 
-def fetch_shorts_analytics(days=14):
+def fetch_shorts_analytics(days=14, videos=None):
     analytics = get_analytics_client()
 
     start_date = (date.today() - timedelta(days=days)).isoformat()
     end_date = date.today().isoformat()
 
-    videos = fetch_videos()
+    if videos is None:
+        videos = fetch_videos()
     video_ids = list(videos.keys())
 
     results = {}
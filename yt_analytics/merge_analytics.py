@@ -7,8 +7,8 @@ from .classify import classify_hook
 
 def merge_analytics(days=14):
     videos = fetch_videos()
-    analytics_data = fetch_shorts_analytics(days=days)
-    engagement_data = fetch_engagement()
+    analytics_data = fetch_shorts_analytics(days=days, videos=videos)
+    engagement_data = fetch_engagement(videos=videos)
 
     merged = {}
 
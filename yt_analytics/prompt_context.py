@@ -1,11 +1,30 @@
+import time
+
 from yt_analytics.prompt_insights import derive_prompt_insights
 
+# Insights change slowly — fetch once per batch, not per LLM call
+INSIGHT_TTL_SEC = 6 * 3600
 
-def build_prompt_with_insights(base_prompt: str) -> str:
+# A failed fetch is retried soon, without hammering a down API per call
+FAILURE_TTL_SEC = 5 * 60
+
+_insight_cache = {"block": None, "fetched_at": 0.0, "ttl": INSIGHT_TTL_SEC}
+
+
+def build_insight_block() -> str:
     """
-    Safely enrich the generation prompt with analytics-based insights.
-    Falls back silently if analytics is unavailable.
+    Analytics-based insight block, identical for every prompt in a batch.
+    Cached so the prompt prefix stays byte-stable (and cacheable by the
+    LLM backend). Returns "" if analytics is unavailable.
     """
+    now = time.time()
+    if (
+        _insight_cache["block"] is not None
+        and now - _insight_cache["fetched_at"] < _insight_cache["ttl"]
+    ):
+        return _insight_cache["block"]
+
+    ttl = INSIGHT_TTL_SEC
     try:
         insights = derive_prompt_insights()
 
@@ -13,28 +32,49 @@ def build_prompt_with_insights(base_prompt: str) -> str:
         weak = insights.get("weak_hook_examples", [])
 
         if not strong and not weak:
-            return base_prompt
-
-        insight_block = "\n\n".join([
-            "Channel performance insights:",
-            (
-                "High-retention hook examples:\n"
-                + "\n".join(f"- {t}" for t in strong)
-                if strong else ""
-            ),
-            (
-                "Low-retention hook examples to avoid:\n"
-                + "\n".join(f"- {t}" for t in weak)
-                if weak else ""
-            ),
-            "Guidelines:",
-            "- Strong hook in first 2 seconds",
-            "- Direct second-person address",
-            "- Short, punchy sentences",
-        ])
-
-        return insight_block + "\n\n" + base_prompt
+            block = ""
+        else:
+            block = "\n\n".join([
+                "Channel performance insights:",
+                (
+                    "High-retention hook examples:\n"
+                    + "\n".join(f"- {t}" for t in strong)
+                    if strong else ""
+                ),
+                (
+                    "Low-retention hook examples to avoid:\n"
+                    + "\n".join(f"- {t}" for t in weak)
+                    if weak else ""
+                ),
+                "Guidelines:",
+                "- Strong hook in first 2 seconds",
+                "- Direct second-person address",
+                "- Short, punchy sentences",
+            ])
 
     except Exception:
         # ⚠️ Analytics should NEVER break generation
-        return base_prompt
+        block = ""
+        ttl = FAILURE_TTL_SEC
+
+    _insight_cache["block"] = block
+    _insight_cache["fetched_at"] = now
+    _insight_cache["ttl"] = ttl
+    return block
+
+
+def build_prompt_parts(base_prompt: str) -> tuple[str, str]:
+    """
+    Splits a generation prompt into (stable prefix, variable suffix).
+    The prefix is shared by every call in a batch.
+    """
+    return build_insight_block(), base_prompt
+
+
+def build_prompt_with_insights(base_prompt: str) -> str:
+    """
+    Safely enrich the generation prompt with analytics-based insights.
+    Falls back silently if analytics is unavailable.
+    """
+    prefix, suffix = build_prompt_parts(base_prompt)
+    return prefix + "\n\n" + suffix if prefix else suffix